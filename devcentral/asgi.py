@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devcentral.settings')
+# serve the feed, profile and explore pages from social/async_views.py
+os.environ.setdefault('SOCIAL_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
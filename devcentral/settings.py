@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'social.middleware.ReadYourWritesMiddleware',  # before anything that reads the DB
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,13 +76,115 @@ WSGI_APPLICATION = 'devcentral.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SOCIAL_SQLITE_MODE picks how SQLite is set up:
+#   basic       Django's stock setup (default). Leaves the checked-in
+#               db.sqlite3 alone and is the baseline `manage.py bench_sqlite`
+#               compares against.
+#   production  tuned for several concurrent workers: WAL lets readers run
+#               alongside the writer, BEGIN IMMEDIATE takes the write lock up
+#               front (a deferred transaction that upgrades mid-way fails with
+#               "database is locked" instead of waiting), the busy timeout
+#               makes writers queue for the lock, and connections are reused
+#               across requests. WAL is stored in the file itself, so the
+#               first connection converts the database for good.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',  # persistent in the file; readers never block the writer
+    'PRAGMA synchronous=NORMAL',  # safe with WAL; fsync at checkpoints, not every commit
+    'PRAGMA mmap_size=134217728',  # 128 MB of the file memory-mapped
+    'PRAGMA cache_size=-16000',  # 16 MB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+]
+SQLITE_MODES = {
+    'basic': {
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+    },
+    'production': {
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # seconds a writer waits for the lock (busy_timeout)
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        **SQLITE_MODES[os.environ.get('SOCIAL_SQLITE_MODE', 'basic')],
     }
 }
 
+# Read replicas: reads go to these aliases, writes to 'default' (see
+# social/routers.py). Keeping them in sync is up to the deployment (e.g.
+# Litestream or periodic `sqlite3 .backup` for SQLite, streaming
+# replication for Postgres). For a local try-out point SOCIAL_DB_REPLICA
+# at a copy of db.sqlite3. In tests replicas mirror 'default'.
+if os.environ.get('SOCIAL_DB_REPLICA'):
+    replica_options = dict(DATABASES['default']['OPTIONS'])
+    replica_options['init_command'] = ';'.join(filter(None, [
+        replica_options.get('init_command'), 'PRAGMA query_only=ON',  # writes here are bugs
+    ]))
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['SOCIAL_DB_REPLICA'],
+        'OPTIONS': replica_options,
+        'TEST': {'MIRROR': 'default'},
+    }
+SOCIAL_DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['social.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# Pick the backend with the SOCIAL_CACHE environment variable:
+#   locmem  per-process memory (default; fine for runserver and tests)
+#   file    files under var/cache, shared by all workers on one node
+#   db      a table in the main SQLite database (run `manage.py createcachetable`)
+#   redis   Redis or a protocol-compatible server (Valkey, KeyDB, ...) at
+#           REDIS_URL, shared across nodes; needs the `redis` package
+# The app reaches it through social.caching namespaces.
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'social_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    },
+}
+SOCIAL_CACHE = os.environ.get('SOCIAL_CACHE', 'locmem')
+CACHES = {
+    'default': {**CACHE_BACKENDS[SOCIAL_CACHE], 'KEY_PREFIX': 'devcentral'},
+}
+
+
+# Live updates
+# How social.live carries events between processes, picked with the
+# SOCIAL_LIVE environment variable:
+#   local  within one process (default; a single ASGI worker, development)
+#   redis  Redis pub/sub at REDIS_URL, for several workers or nodes; needs the
+#          `redis` package
+
+SOCIAL_LIVE_BACKENDS = {
+    'local': 'social.live.LocalBackend',
+    'redis': 'social.live.RedisBackend',
+}
+SOCIAL_LIVE_BACKEND = SOCIAL_LIVE_BACKENDS[os.environ.get('SOCIAL_LIVE', 'local')]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +229,50 @@ MEDIA_ROOT = BASE_DIR / 'media'
 LOGIN_REDIRECT_URL = 'social:feed'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Social app tuning
+SOCIAL_FEED_PAGE_SIZE = 20  # posts per "load older" page on the home feed
+SOCIAL_TIMELINE_FANOUT_LIMIT = 5000  # above this many followers, merge posts at read time
+SOCIAL_TIMELINE_BACKFILL = 200  # recent posts copied into a timeline on follow
+SOCIAL_FOLLOW_PREVIEW = 6  # followers/following shown inline on a profile
+SOCIAL_FOLLOW_PAGE_SIZE = 50  # per page on the full followers/following lists
+SOCIAL_COUNTER_FLUSH_INTERVAL = 1.0  # seconds between write-behind counter flushes (0 = write-through)
+SOCIAL_COUNTER_MAX_PENDING = 1000  # dirty posts that force an early flush
+SOCIAL_IMAGE_WIDTHS = {  # WebP variant widths generated per upload (px)
+    'avatar': (48, 96, 240),
+    'post': (320, 640, 1280),
+}
+SOCIAL_GIF_MAX_BYTES = 2 * 1024 * 1024  # larger GIF uploads are rejected
+SOCIAL_SEARCH_BACKEND = 'social.search.SQLiteSearchBackend'  # full-text search implementation
+SOCIAL_SEARCH_PAGE_SIZE = 20  # results per search page
+SOCIAL_PYGMENTS_STYLE = 'github-dark'  # theme written by `manage.py build_pygments_css`
+SOCIAL_EXPLORE_PAGE_SIZE = 25  # posts per Explore page
+SOCIAL_PROFILE_PAGE_SIZE = 20  # posts per page on a profile
+SOCIAL_RANK_DECAY_SECONDS = 45000  # Explore: this much newer is worth 10x the engagement
+SOCIAL_RANK_WINDOW_DAYS = 7  # Explore: posts younger than this are rescored periodically
+SOCIAL_REPLY_PREVIEW = 3  # latest replies preloaded under each post on list pages
+SOCIAL_REPLY_PAGE_SIZE = 50  # replies per page when a thread is opened
+SOCIAL_FRAGMENT_CACHE_TIMEOUT = 300  # seconds a rendered post card stays cached (0 = off)
+SOCIAL_CACHE_LOCK_TIMEOUT = 10  # seconds one process may hold a cache recompute lock
+# seconds follow lists stay cached; a follow only clears the cache of the worker
+# that made it, so with per-process locmem keep the others' copies short-lived
+SOCIAL_FOLLOW_CACHE_TIMEOUT = 30 if SOCIAL_CACHE == 'locmem' else 3600
+SOCIAL_MEMBER_PAGE_SIZE = 50  # members per page in the directory
+SOCIAL_MEMBER_INDEX_REFRESH = 60  # seconds between catch-ups of the username index with other workers
+SOCIAL_SUGGESTED_MEMBERS = 8  # members suggested in the feed's left rail
+SOCIAL_DB_STICKY_SECONDS = 5  # reads stay on the primary this long after a browser writes
+SOCIAL_ASYNC_VIEWS = os.environ.get('SOCIAL_ASYNC_VIEWS') == '1'  # async feed/profile/explore; devcentral/asgi.py sets it
+SOCIAL_ASYNC_PARALLEL_READS = True  # async views run independent reads in separate threads/connections
+SOCIAL_LIVE_QUEUE_SIZE = 100  # undelivered events a live stream may hold before it is told to resync
+SOCIAL_LIVE_KEEPALIVE = 15  # seconds between keep-alive comments on an idle live stream
+SOCIAL_JOBS_EAGER = os.environ.get('SOCIAL_JOBS_EAGER') == '1'  # run background jobs inline (no worker needed); otherwise run `manage.py run_jobs`
+SOCIAL_JOBS_THREADS = 4  # worker threads per run_jobs process
+SOCIAL_JOBS_TIMEOUT = 600  # seconds before a running job is assumed dead and re-queued
+SOCIAL_JOBS_PERIODIC = {  # job name -> interval (seconds), scheduled by run_jobs
+    'counters.reconcile': 3600,
+    'explore.rescore': 300,
+    'jobs.prune': 24 * 3600,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
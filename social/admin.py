@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.contrib import admin
-from .models import Profile, Post, Reply, Reaction, Share
+from .models import Job, Profile, Post, Reply, Reaction, Share
 
 
 
 # Register your models here.
-admin.site.register([Profile, Post, Reply, Reaction, Share])
+admin.site.register([Profile, Post, Reply, Reaction, Share, Job])
@@ -7,4 +7,5 @@ class SocialConfig(AppConfig):
     # label = 'devcentral_social'
 
     def ready(self):
-        from . import signals # Import signals to ensure they are registered
\ No newline at end of file
+        from . import signals # Import signals to ensure they are registered
+        from . import tasks  # registers background job handlers
\ No newline at end of file
@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.db import close_old_connections, connection
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import render
+
+from . import follows, fragments, live, members, reactions, replies, timeline, views
+from .counters import post_counters
+from .forms import PostForm, ProfileForm, ReplyForm
+from .models import Post
+from .pagination import decode_cursor, keyset_page, page_size
+
+User = get_user_model()
+
+# Async page views
+# -----------------------------------------------
+# The read-heavy pages (feed, profile, explore) for the ASGI stack. They do
+# the same work as their twins in social/views.py, but the independent reads
+# of a page run at the same time with asyncio.gather instead of one after
+# another, and no worker thread is held while they wait.
+#
+# SQLite's driver is blocking, and Django's async ORM funnels every query
+# through one shared thread, so reads that should overlap go through
+# `read()`: each call runs in a pool thread with its own connection (under
+# SOCIAL_SQLITE_MODE=production, WAL lets them run alongside a writer too).
+# SOCIAL_ASYNC_PARALLEL_READS=False keeps them on the shared thread, as does
+# an in-memory test database, whose data lives in a transaction only the
+# main connection can see.
+#
+# urls.py picks these when SOCIAL_ASYNC_VIEWS is on (devcentral/asgi.py
+# turns it on), along with the live update stream.
+
+
+def parallel_reads():
+    # an in-memory SQLite database (the test database) can't be shared
+    # between connections that way
+    in_memory = connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    return getattr(settings, 'SOCIAL_ASYNC_PARALLEL_READS', True) and not in_memory
+
+
+def read(func):
+    """``func`` as an awaitable that can run alongside other reads."""
+    parallel = parallel_reads()
+
+    @wraps(func)
+    def call(*args, **kwargs):
+        if parallel:
+            close_old_connections()  # pool threads outlive requests
+        return func(*args, **kwargs)
+    return sync_to_async(call, thread_sensitive=not parallel)
+
+
+async def viewer(request):
+    user = await request.auser()
+    request.user = user  # the sync template context reads request.user
+    return user
+
+
+async def decorate(user, posts):
+    """attach_latest + annotate_posts side by side, then the cheap in-memory bits."""
+    await asyncio.gather(
+        read(replies.attach_latest)(posts),
+        read(reactions.annotate_posts)(user, posts),
+    )
+    post_counters.overlay(posts)
+    await read(fragments.prime)(posts)
+
+
+# -----------------------
+# Feed
+# -----------------------
+@login_required
+async def feed_view(request):
+    user = await viewer(request)
+    cursor = decode_cursor(request.GET.get('cursor'), datetime, int)
+    (posts, next_cursor), suggested, followed = await asyncio.gather(
+        read(timeline.timeline_page)(user, cursor, page_size('SOCIAL_FEED_PAGE_SIZE', 20)),
+        read(members.suggested)(user),
+        read(follows.followed_ids)(user),
+    )
+    await decorate(user, posts)
+
+    return await sync_to_async(render)(request, 'feed.html', {
+        'posts': posts,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+        'post_form': PostForm(),
+        'reply_form': ReplyForm(),
+        'suggested_members': suggested,
+        'followed_ids': followed,
+    })
+
+
+# -----------------------
+# Profiles
+# -----------------------
+@login_required
+async def profile(request, username):
+    if request.method == 'POST':
+        # profile edits are rare; the sync view handles the form
+        return await sync_to_async(views.profile)(request, username)
+
+    user = await viewer(request)
+    try:
+        profile_user = await User.objects.select_related('profile').aget(username=username)
+    except User.DoesNotExist:
+        raise Http404("No such user.")
+
+    preview = page_size('SOCIAL_FOLLOW_PREVIEW', 6)
+    cursor = decode_cursor(request.GET.get('cursor'), datetime, int)
+    followers, following, is_following, (posts, next_cursor) = await asyncio.gather(
+        read(follows.preview)(profile_user, 'followers', preview),
+        read(follows.preview)(profile_user, 'following', preview),
+        read(follows.is_following)(user, profile_user),
+        read(keyset_page)(
+            Post.objects.filter(author=profile_user).select_related('author', 'author__profile'),
+            ('-created_at', '-id'), cursor, page_size('SOCIAL_PROFILE_PAGE_SIZE', 20),
+        ),
+    )
+    await decorate(user, posts)
+
+    return await sync_to_async(render)(request, 'profile.html', {
+        'profile_user': profile_user,
+        'followers': followers,
+        'follower_count': profile_user.profile.follower_count,
+        'following': following,
+        'following_count': profile_user.profile.following_count,
+        'is_following': is_following,
+        'posts': posts,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+        'reply_form': ReplyForm(),
+        'form': ProfileForm(instance=profile_user.profile) if user == profile_user else None,
+    })
+
+
+# -----------------------
+# Explore
+# -----------------------
+@login_required
+async def posts_explore(request):
+    user = await viewer(request)
+    sort = request.GET.get('sort')
+    if sort not in views.EXPLORE_SORTS:
+        sort = 'top'
+    fields, types = views.EXPLORE_SORTS[sort]
+    cursor = decode_cursor(request.GET.get('cursor'), *types)
+    (posts, next_cursor), followed = await asyncio.gather(
+        read(keyset_page)(
+            Post.objects.select_related('author', 'author__profile'),
+            fields, cursor, page_size('SOCIAL_EXPLORE_PAGE_SIZE', 25),
+        ),
+        read(follows.followed_ids)(user),
+    )
+    await decorate(user, posts)
+
+    return await sync_to_async(render)(request, 'explore.html', {
+        'posts': posts,
+        'sort': sort,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+        'followed_ids': followed,
+        'reply_form': ReplyForm(),
+    })
+
+
+# -----------------------
+# Live updates
+# -----------------------
+@login_required
+async def live_stream(request):
+    """Server-Sent Events from social.live for the viewer's open feed."""
+    user = await viewer(request)
+    followed = await read(follows.followed_ids)(user)
+
+    async def events():
+        with live.hub.subscribe(user.pk, followed) as sub:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.get(), live.keepalive())
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield live.format_event(event)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through as they come
+    return response
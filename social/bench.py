@@ -0,0 +1,118 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Follow, Post, Profile, Reply, TimelineEntry
+
+User = get_user_model()
+
+# Synthetic data + measurement helpers
+# -----------------------------------------------
+# Shared by social/tests.py (small scales, asserts query counts are flat) and
+# the `manage.py bench_*` commands (large scales, wall time, concurrency).
+# Everything is bulk-inserted, so signals don't run: profiles and timeline
+# rows are written here directly.
+
+BATCH_SIZE = 2000
+
+
+def _bulk(model, rows):
+    model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def seed(posts, follows=10, replies_per_post=1, prefix='bench'):
+    """Create a viewer who follows ``follows`` authors sharing ``posts`` posts.
+
+    Returns a dict with the viewer, the followed authors and a stranger the
+    viewer does not follow yet (for the follow/unfollow endpoints).
+    """
+    viewer = User.objects.create_user(f'{prefix}_viewer')
+    stranger = User.objects.create_user(f'{prefix}_stranger')
+
+    _bulk(User, [User(username=f'{prefix}_author{i}') for i in range(follows)])
+    authors = list(User.objects.filter(username__startswith=f'{prefix}_author').order_by('pk'))
+    _bulk(Profile, [Profile(user=a) for a in authors])
+
+    # viewer follows every author; every author follows the viewer back
+    _bulk(Follow, [Follow(follower=viewer, following=a) for a in authors])
+    _bulk(Follow, [Follow(follower=a, following=viewer) for a in authors])
+    Profile.objects.filter(user__in=authors).update(follower_count=1, following_count=1)
+    Profile.objects.filter(user=viewer).update(follower_count=len(authors), following_count=len(authors))
+
+    now = timezone.now()
+    _bulk(Post, [
+        Post(author=authors[i % len(authors)], body=f'post {i} from {prefix}',
+             created_at=now - timedelta(seconds=i))
+        for i in range(posts)
+    ])
+    post_rows = list(Post.objects
+                     .filter(author__in=authors)
+                     .values_list('pk', 'author_id', 'created_at'))
+    _bulk(TimelineEntry, [
+        TimelineEntry(user=viewer, post_id=pk, author_id=author_id, created_at=created_at)
+        for pk, author_id, created_at in post_rows
+    ])
+    _bulk(Reply, [
+        Reply(post_id=pk, author=viewer, body=f'reply {n}')
+        for pk, _, _ in post_rows
+        for n in range(replies_per_post)
+    ])
+    Post.objects.filter(author__in=authors).update(reply_count=replies_per_post)
+
+    return {
+        'viewer': viewer,
+        'authors': authors,
+        'stranger': stranger,
+        'post': Post.objects.filter(author__in=authors).order_by('-created_at').first(),
+    }
+
+
+def scenarios(data):
+    """(name, method, url) for every view the regression suite watches."""
+    author = data['authors'][0].username
+    viewer = data['viewer'].username
+    stranger = data['stranger'].username
+    pk = data['post'].pk
+    return [
+        ('feed', 'get', reverse('social:feed')),
+        ('profile', 'get', reverse('social:profile', args=[author])),
+        ('followers', 'get', reverse('social:followers', args=[viewer])),
+        ('following', 'get', reverse('social:following', args=[viewer])),
+        ('explore', 'get', reverse('social:explore')),
+        ('users', 'get', reverse('social:users')),
+        ('typeahead', 'get', reverse('social:users-typeahead') + f'?q={author[:3]}'),
+        ('like', 'post', reverse('social:post-react', args=[pk, 'like'])),
+        ('dislike', 'post', reverse('social:post-react', args=[pk, 'dislike'])),
+        ('share', 'post', reverse('social:post-share', args=[pk])),
+        ('follow', 'post', reverse('social:follow', args=[stranger])),
+        ('unfollow', 'post', reverse('social:unfollow', args=[stranger])),
+    ]
+
+
+def measure(client, method, url):
+    """Return (status_code, query_count, seconds) for one request."""
+    data = {'next': reverse('social:feed')} if method == 'post' else None
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = getattr(client, method)(url, data)
+        elapsed = time.perf_counter() - start
+    return response.status_code, len(ctx.captured_queries), elapsed
+
+
+def use_scratch_db(path, mode='production'):
+    """Point the default alias at the SQLite file ``path``, set up as SQLITE_MODES[mode].
+
+    For benchmarks that need a real file several threads or processes can
+    share; the real database is never opened.
+    """
+    connections.close_all()
+    db = connection.settings_dict
+    db.update({'NAME': path, 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False})
+    db.update({key: (dict(value) if key == 'OPTIONS' else value)
+               for key, value in settings.SQLITE_MODES[mode].items()})
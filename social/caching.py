@@ -0,0 +1,195 @@
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+# App cache layer
+# -----------------------------------------------
+# Everything the app caches goes through a Namespace rather than the raw
+# Django cache, so keys never collide and a whole family can be dropped:
+#
+#   markdown_cache = Namespace('markdown', timeout=24 * 3600)
+#   html = markdown_cache.get_or_set(key, lambda: render(body))
+#   markdown_cache.clear()  # every markdown entry is gone
+#
+# Keys are '<namespace>:<version>:<generation>:<key>'. `version` is fixed in
+# code: bump it when the shape of the cached values changes. The generation
+# lives in the cache itself and clear() moves it on, which retires the
+# namespace's entries without having to find them.
+#
+# get_or_set() protects expensive values from stampedes two ways: a short
+# lock (an atomic add, see add()) lets one caller recompute a missing value
+# while the rest wait for it, and each entry remembers how long it took to
+# compute so a caller may refresh it a little before it expires
+# (probabilistic early expiration, "XFetch"); while that happens everyone
+# else keeps getting the current value.
+#
+# The backend is Django's CACHES, chosen with the SOCIAL_CACHE environment
+# variable (see devcentral/settings.py): per-process memory, a file cache
+# shared by the workers of one node, the main SQLite database, or Redis (or
+# anything speaking its protocol, e.g. Valkey) for several nodes.
+
+NAMESPACES = {}  # name -> Namespace, for stats()
+
+
+def lock_timeout():
+    """Longest a get_or_set() recompute may hold its lock (seconds)."""
+    return getattr(settings, 'SOCIAL_CACHE_LOCK_TIMEOUT', 10)
+
+
+def add(cache, key, value, timeout):
+    """cache.add() that only one caller can win, on every backend.
+
+    FileBasedCache.add() checks for the file and then writes it, so two
+    workers can both "add" the same key. Here the entry is written to a
+    temporary file and hard-linked into place, which fails if the file
+    already exists.
+    """
+    if not isinstance(cache, FileBasedCache):
+        return cache.add(key, value, timeout)
+    if cache.has_key(key):  # also removes the file if it has expired
+        return False
+    cache._createdir()
+    fd, tmp_path = tempfile.mkstemp(dir=cache._dir)
+    try:
+        with open(fd, 'wb') as f:
+            cache._write_content(f, timeout, value)
+        os.link(tmp_path, cache._key_to_file(key))
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+
+
+class Namespace:
+    def __init__(self, name, timeout=300, version=1, alias='default', beta=1.0):
+        # timeout may be a callable (e.g. reading a setting); None = no expiry
+        self.name, self.version, self.alias, self.beta = name, version, alias, beta
+        self._timeout = timeout
+        self._stats = Counter()
+        self._lock = threading.Lock()
+        NAMESPACES[name] = self
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def timeout(self):
+        return self._timeout() if callable(self._timeout) else self._timeout
+
+    def _generation_key(self):
+        return f'{self.name}:{self.version}:generation'
+
+    def _prefix(self):
+        gen = self.cache.get(self._generation_key())
+        if gen is None:
+            # first use: exactly one caller picks the generation
+            add(self.cache, self._generation_key(), time.time_ns(), None)
+            gen = self.cache.get(self._generation_key())
+        return f'{self.name}:{self.version}:{gen}:'
+
+    @staticmethod
+    def _key(key):
+        # ('followers', 42) -> 'followers:42'
+        return ':'.join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+    def _record(self, hits=0, misses=0):
+        with self._lock:
+            self._stats['hits'] += hits
+            self._stats['misses'] += misses
+
+    # Entries are stored as (value, expires_at, cost): expires_at is None for
+    # entries without a timeout, cost is how long the value took to compute.
+    def _wrap(self, value, timeout, cost=0.0):
+        return (value, time.time() + timeout if timeout else None, cost)
+
+    def get(self, key, default=None):
+        entry = self.cache.get(self._prefix() + self._key(key))
+        self._record(hits=entry is not None, misses=entry is None)
+        return default if entry is None else entry[0]
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached."""
+        prefix = self._prefix()
+        found = self.cache.get_many([prefix + self._key(k) for k in keys])
+        result = {k: found[prefix + self._key(k)][0] for k in keys if prefix + self._key(k) in found}
+        self._record(hits=len(result), misses=len(keys) - len(result))
+        return result
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.cache.set(self._prefix() + self._key(key), self._wrap(value, timeout), timeout)
+
+    def set_many(self, mapping, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        prefix = self._prefix()
+        self.cache.set_many({prefix + self._key(k): self._wrap(v, timeout) for k, v in mapping.items()}, timeout)
+
+    def delete(self, *keys):
+        prefix = self._prefix()
+        self.cache.delete_many([prefix + self._key(k) for k in keys])
+
+    def clear(self):
+        """Drop every entry in the namespace."""
+        self.cache.set(self._generation_key(), time.time_ns(), timeout=None)
+
+    def _stale(self, entry):
+        _, expires_at, cost = entry
+        if expires_at is None or not cost:
+            return False
+        # refresh early with a probability that rises as expiry nears and
+        # with how expensive the value is to recompute
+        return time.time() - cost * self.beta * math.log(1 - random.random()) >= expires_at
+
+    def get_or_set(self, key, compute, timeout=None):
+        """The cached value of ``key``, computing and storing it if needed."""
+        timeout = self.timeout if timeout is None else timeout
+        full_key = self._prefix() + self._key(key)
+        entry = self.cache.get(full_key)
+        if entry is not None and not self._stale(entry):
+            self._record(hits=1)
+            return entry[0]
+
+        lock_key, waited = full_key + ':lock', 0.0
+        locked = add(self.cache, lock_key, 1, lock_timeout())
+        while not locked:
+            if entry is not None:
+                # someone else is (re)computing it; the value we have will do
+                self._record(hits=1)
+                return entry[0]
+            if waited >= lock_timeout():
+                break  # lock holder died or is stuck: compute it ourselves
+            time.sleep(0.05)
+            waited += 0.05
+            entry = self.cache.get(full_key)
+            locked = entry is None and add(self.cache, lock_key, 1, lock_timeout())
+
+        self._record(misses=1)
+        try:
+            start = time.monotonic()
+            value = compute()
+            self.cache.set(full_key, self._wrap(value, timeout, time.monotonic() - start), timeout)
+        finally:
+            if locked:
+                self.cache.delete(lock_key)
+        return value
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self._stats['hits'], self._stats['misses']
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 3) if total else None}
+
+
+def stats():
+    """Hit/miss counts of every namespace in this process."""
+    return {name: ns.stats() for name, ns in sorted(NAMESPACES.items())}
@@ -0,0 +1,145 @@
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Write-behind counters
+# -----------------------------------------------
+# Likes, dislikes and shares on a hot post used to be one UPDATE of the same
+# Post row per click; on SQLite every one of those takes the database write
+# lock. Instead, increments are accumulated in memory per (row, field) and
+# written by a background thread every SOCIAL_COUNTER_FLUSH_INTERVAL seconds,
+# as a handful of UPDATEs inside a single transaction.
+#
+# Bounds: at most one interval's worth of increments is pending, and the
+# buffer flushes early once SOCIAL_COUNTER_MAX_PENDING rows are dirty. The
+# buffer is flushed at interpreter exit; a hard kill loses at most one
+# interval, which `manage.py reconcile_counters` repairs from the source rows.
+# An interval of 0 disables buffering (write-through), which tests rely on.
+
+
+def flush_interval():
+    return float(getattr(settings, 'SOCIAL_COUNTER_FLUSH_INTERVAL', 1.0))
+
+
+def max_pending():
+    return int(getattr(settings, 'SOCIAL_COUNTER_MAX_PENDING', 1000))
+
+
+class CounterBuffer:
+    def __init__(self, model):
+        self.model = model
+        self._pending = defaultdict(Counter)  # pk -> Counter({field: delta})
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, pk, **deltas):
+        """Queue ``field=delta`` increments for row ``pk``."""
+        with self._lock:
+            self._pending[pk].update(deltas)
+            dirty = len(self._pending)
+        if flush_interval() <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if dirty >= max_pending():
+            self._wake.set()
+
+    def pending(self, pk):
+        """Increments for ``pk`` not written yet (this process only)."""
+        with self._lock:
+            return dict(self._pending.get(pk, {}))
+
+    def overlay(self, objs):
+        """Add not-yet-flushed increments to loaded objects (read-your-writes)."""
+        with self._lock:
+            if not self._pending:
+                return objs
+            for obj in objs:
+                for field, delta in self._pending.get(obj.pk, {}).items():
+                    setattr(obj, field, getattr(obj, field) + delta)
+        return objs
+
+    def flush(self):
+        """Write every pending increment; returns the number of rows touched."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(Counter)
+            if not batch:
+                return 0
+
+            # Rows with identical deltas (the common case: +1 like) share one
+            # UPDATE ... WHERE pk IN (...).
+            groups = defaultdict(list)
+            for pk, deltas in batch.items():
+                key = tuple(sorted((f, d) for f, d in deltas.items() if d))
+                if key:
+                    groups[key].append(pk)
+            if not groups:
+                return len(batch)  # everything cancelled out
+            dropped = []
+            try:
+                with transaction.atomic():
+                    for key, pks in groups.items():
+                        try:
+                            with transaction.atomic():
+                                self.model.objects.filter(pk__in=pks).update(
+                                    **{field: self._apply(field, delta) for field, delta in key}
+                                )
+                        except (IntegrityError, DataError):
+                            # These rows can't take this delta at all; retrying
+                            # would only hold back every other counter. The
+                            # periodic reconcile job repairs them.
+                            logger.exception("Dropping counter deltas %s for %s %s",
+                                             dict(key), self.model.__name__, pks)
+                            dropped.extend(pks)
+            except Exception:
+                logger.exception("Counter flush failed; will retry")
+                with self._lock:
+                    for pk, deltas in batch.items():
+                        self._pending[pk].update(deltas)
+                return 0
+            return len(batch) - len(dropped)
+
+    @staticmethod
+    def _apply(field, delta):
+        # Decrements stop at zero: counters are unsigned, and a -1 can land
+        # before the +1 it undoes when another worker holds that one.
+        if delta < 0:
+            return Greatest(F(field) + delta, 0)
+        return F(field) + delta
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f'{self.model.__name__}-counter-flush', daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(flush_interval())
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+post_counters = CounterBuffer(Post)
+atexit.register(post_counters.flush)
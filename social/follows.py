@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .caching import Namespace
+from .models import Follow, Profile
+
+# Follow graph
+# -----------------------------------------------
+# Follow is the single source of truth for who follows whom. The counters on
+# Profile are denormalized from it and only ever changed here, in the same
+# transaction as the edge, so they can't drift from the table.
+#
+# Every page asks for the viewer's followed ids, and profiles show a preview
+# of both lists; both are cached and dropped here whenever an edge changes.
+# That only reaches the cache of the process making the change: with a
+# per-process cache (locmem) the other workers keep their copy until it
+# expires, so the TTL is kept short there.
+
+
+def cache_timeout():
+    """Seconds the follow lists stay cached."""
+    return getattr(settings, 'SOCIAL_FOLLOW_CACHE_TIMEOUT', 30)
+
+
+follow_cache = Namespace('follows', timeout=cache_timeout, version=2)  # 2: previews keep their size
+
+
+def followed_ids(user):
+    """Ids of users ``user`` follows (one indexed query, then cached)."""
+    if not user.is_authenticated:
+        return set()
+    return follow_cache.get_or_set(('following-ids', user.pk), lambda: set(
+        Follow.objects.filter(follower=user).values_list('following_id', flat=True)
+    ))
+
+
+def is_following(user, target):
+    if not user.is_authenticated or user.pk == target.pk:
+        return False
+    return target.pk in followed_ids(user)
+
+
+def preview(user, direction, size):
+    """The ``size`` newest followers / followed users of ``user``."""
+    mine, theirs = ('following', 'follower') if direction == 'followers' else ('follower', 'following')
+
+    def fetch():
+        return size, [getattr(edge, theirs) for edge in (Follow.objects
+                                                         .filter(**{mine: user})
+                                                         .select_related(theirs)
+                                                         .order_by('-created_at', '-id')[:size])]
+
+    # One entry per user and direction (so forget() can drop it), remembering
+    # how many people it was fetched for: a bigger preview fetches again.
+    fetched, people = follow_cache.get_or_set((direction, user.pk), fetch)
+    if fetched < size:
+        fetched, people = fetch()
+        follow_cache.set((direction, user.pk), (fetched, people))
+    return people[:size]
+
+
+def forget(*user_ids):
+    """Drop the cached follow data of these users."""
+    follow_cache.delete(*[(name, pk) for pk in user_ids
+                          for name in ('following-ids', 'followers', 'following')])
+
+
+def follow(user, target):
+    """Create the edge user → target. Returns False if it already existed."""
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(follower=user, following=target)
+        if created:
+            Profile.objects.filter(user=target).update(follower_count=F('follower_count') + 1)
+            Profile.objects.filter(user=user).update(following_count=F('following_count') + 1)
+    if created:
+        forget(user.pk, target.pk)
+    return created
+
+
+def unfollow(user, target):
+    """Remove the edge user → target. Returns False if there was none."""
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower=user, following=target).delete()
+        if deleted:
+            Profile.objects.filter(user=target).update(follower_count=F('follower_count') - 1)
+            Profile.objects.filter(user=user).update(following_count=F('following_count') - 1)
+    if deleted:
+        forget(user.pk, target.pk)
+    return bool(deleted)
@@ -4,10 +4,21 @@ from django.contrib.auth.models import User
 from .models import Profile, Post, Reply
 from .models import Post
 from .models import Post, CodeSnippet  # <-- include CodeSnippet
+from . import images
 
 # Forms
 # -----------------------------------------------
 
+def limit_gif_size(image):
+    # Big animated GIFs are the worst offenders for page weight; the variant
+    # pipeline would flatten them anyway, so refuse them up front. Used for
+    # every image upload (posts and avatars).
+    limit = images.gif_max_bytes()
+    if image and getattr(image, 'content_type', '') == 'image/gif' and image.size > limit:
+        raise forms.ValidationError(f"Animated GIFs must be under {limit // (1024 * 1024)} MB.")
+    return image
+
+
 # Signup form extending UserCreationForm
 # Includes avatar upload and bio
 # -----------------------------------------------
@@ -16,7 +27,7 @@ class SignUpForm(UserCreationForm):
     first_name = forms.CharField(max_length=30)
     last_name = forms.CharField(max_length=30)
     bio = forms.CharField(max_length=280, required=False)
-    avatar = forms.ImageField(required=False)
+    avatar = forms.ImageField(required=False, validators=[limit_gif_size])
     class Meta:
         model = User
         fields = ('username','first_name','last_name','email','password1','password2','bio','avatar')
@@ -26,12 +37,18 @@ class SignUpForm(UserCreationForm):
 class ProfileForm(forms.ModelForm):
     class Meta: model = Profile; fields = ('bio','avatar')
 
+    def clean_avatar(self):
+        return limit_gif_size(self.cleaned_data.get('avatar'))
+
 # Post creation form
 # -----------------------------------------------
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post; fields = ('body','image')
         widgets = {'body': forms.Textarea(attrs={'rows':3,'placeholder':'Share something…'})}
+
+    def clean_image(self):
+        return limit_gif_size(self.cleaned_data.get('image'))
         
 # --- ADD THIS: CodeSnippetForm ---
 LANGUAGE_CHOICES = [
@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.utils.html import escape
+
+from .caching import Namespace
+
+# Post card fragment cache
+# -----------------------------------------------
+# A rendered post card depends on the post (body, image, replies preview,
+# counters), on its author's avatar, and on who is looking: their own post
+# (edit/delete buttons), whether they follow the author, what they reacted.
+# The cache key carries all of that:
+#
+#   <variant>:<pk>:<version>:<counters>:<viewer state>:...   (in `cards`)
+#
+# so counter and viewer-state changes simply select a different entry. The
+# per-post `version` covers content that is not in the key (body, image,
+# preview replies); signals bump it when posts, replies or reactions change
+# (social/signals.py, plus the background jobs that update rows in place).
+# Versions are timestamps, so an evicted version never resurrects an old
+# fragment.
+#
+# Per-request values are rendered as sentinels and substituted on the way
+# out, so one cached card serves every viewer in the same state: the CSRF
+# token and the current URL for the card's forms' "next" fields
+# (`{{ card_next }}` for the full path, `{{ card_path }}` without the query).
+
+CSRF_SENTINEL = 'csrfSENTINEL0postcard'
+NEXT_SENTINEL = 'nextSENTINEL0postcard'
+PATH_SENTINEL = 'pathSENTINEL0postcard'
+
+
+def timeout():
+    """Seconds a card stays cached; 0 disables the cache."""
+    return getattr(settings, 'SOCIAL_FRAGMENT_CACHE_TIMEOUT', 300)
+
+
+cards = Namespace('postcard', timeout=timeout)
+card_versions = Namespace('postcard-version', timeout=None)
+
+
+def version(pk):
+    found = card_versions.get(pk)
+    if found is None:
+        found = time.time_ns()
+        card_versions.set(pk, found)
+    return found
+
+
+def versions(pks):
+    """{pk: version} for a page of posts in one cache round trip."""
+    found = card_versions.get_many(pks)
+    missing = {pk: time.time_ns() for pk in pks if pk not in found}
+    if missing:
+        card_versions.set_many(missing)
+    return {**found, **missing}
+
+
+def invalidate(*pks):
+    """Retire every cached card of these posts."""
+    now = time.time_ns()
+    card_versions.set_many({pk: now for pk in pks})
+
+
+def card_key(post, variant, user, followed_ids):
+    profile = getattr(post.author, 'profile', None)
+    state = (
+        'anon' if not user.is_authenticated
+        else 'own' if user.pk == post.author_id
+        else 'following' if post.author_id in followed_ids
+        else 'other'
+    )
+    # the avatar's upload name and the one its variants were built from
+    avatar = f'{profile.avatar.name}|{(profile.avatar_variants or {}).get("source", "")}' if profile else ''
+    parts = [
+        variant, post.pk, getattr(post, '_card_version', None) or version(post.pk),
+        int(post.created_at.timestamp() * 1e6),
+        post.likes_count, post.dislikes_count, post.shares_count, post.reply_count,
+        state, getattr(post, 'my_reaction', None) or '-',
+        getattr(getattr(post, 'shared_by', None), 'pk', '-'),
+        avatar,
+    ]
+    return ':'.join(str(p) for p in parts)
+
+
+def prime(posts):
+    """Fetch the versions for a page of posts up front (one get_many)."""
+    if timeout():
+        found = versions({p.pk for p in posts})
+        for p in posts:
+            p._card_version = found[p.pk]
+    return posts
+
+
+def personalize(html, request, csrf_token):
+    return (html
+            .replace(CSRF_SENTINEL, escape(str(csrf_token)))
+            .replace(NEXT_SENTINEL, escape(request.get_full_path()))
+            .replace(PATH_SENTINEL, escape(request.path)))
@@ -0,0 +1,111 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, ImageSequence
+
+logger = logging.getLogger(__name__)
+
+# Responsive image variants
+# -----------------------------------------------
+# Uploads are kept as-is, but pages never serve them: on upload we derive a
+# few WebP widths next to the original (EXIF dropped, orientation applied,
+# never upscaled) and record them on the model as
+#     {"source": "<original name>", "widths": {"320": "<variant name>", ...}}
+# Templates then build <img srcset> from that map (see templatetags/images.py).
+# Animated GIFs keep their animation when under SOCIAL_GIF_MAX_BYTES and are
+# flattened to their first frame above it.
+
+DEFAULT_WIDTHS = {
+    'avatar': (48, 96, 240),  # 48px cards/rows at 1x/2x, 120px profile header at 2x
+    'post': (320, 640, 1280),
+}
+FORMAT, EXTENSION, QUALITY = 'WEBP', 'webp', 80
+
+
+def widths_for(kind):
+    return tuple(getattr(settings, 'SOCIAL_IMAGE_WIDTHS', {}).get(kind, DEFAULT_WIDTHS[kind]))
+
+
+def gif_max_bytes():
+    return getattr(settings, 'SOCIAL_GIF_MAX_BYTES', 2 * 1024 * 1024)
+
+
+def variant_name(name, width):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.w{width}.{EXTENSION}'
+
+
+def _resize(frame, width):
+    frame = frame.convert('RGBA' if frame.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    if frame.width <= width:
+        return frame
+    height = max(1, round(frame.height * width / frame.width))
+    return frame.resize((width, height), Image.LANCZOS)
+
+
+def _encode(img, width, animated):
+    out = io.BytesIO()
+    if animated:
+        frames = [_resize(f.copy(), width) for f in ImageSequence.Iterator(img)]
+        frames[0].save(out, FORMAT, save_all=True, append_images=frames[1:], quality=QUALITY,
+                       duration=img.info.get('duration', 100), loop=img.info.get('loop', 0))
+    else:
+        # saving without exif= drops the metadata (camera, GPS, ...)
+        _resize(img, width).save(out, FORMAT, quality=QUALITY)
+    return out.getvalue()
+
+
+def build_variants(field_file, kind):
+    """Generate WebP variants for an ImageField file; return the variants map."""
+    storage = field_file.storage
+    with field_file.open('rb') as fh:
+        raw = fh.read()
+    img = Image.open(io.BytesIO(raw))
+    animated = getattr(img, 'is_animated', False) and len(raw) <= gif_max_bytes()
+    if not animated:
+        img = ImageOps.exif_transpose(img)  # bake in the orientation before measuring
+
+    # Never upscale: widths wider than the source collapse into one variant
+    # at the source's own width.
+    widths = sorted({min(w, img.width) for w in widths_for(kind)})
+    variants = {}
+    for width in widths:
+        name = variant_name(field_file.name, width)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[str(width)] = storage.save(name, ContentFile(_encode(img, width, animated)))
+    return {'source': field_file.name, 'widths': variants}
+
+
+def delete_variants(storage, variants):
+    for name in (variants or {}).get('widths', {}).values():
+        try:
+            storage.delete(name)
+        except OSError:
+            pass
+
+
+def refresh(instance, field, variants_field, kind, force=False):
+    """(Re)build variants when ``instance.<field>`` changed; returns True if it did.
+
+    Writes the map with a queryset update so post_save isn't re-triggered.
+    """
+    field_file = getattr(instance, field)
+    current = getattr(instance, variants_field) or {}
+    if not force and current.get('source') == (field_file.name or None):
+        return False
+
+    delete_variants(field_file.storage, current)
+    variants = {}
+    if field_file:
+        try:
+            variants = build_variants(field_file, kind)
+        except (OSError, Image.DecompressionBombError, ValueError):
+            logger.exception("Could not build %s variants for %s", kind, field_file.name)
+            variants = {'source': field_file.name, 'widths': {}}
+    setattr(instance, variants_field, variants)
+    type(instance).objects.filter(pk=instance.pk).update(**{variants_field: variants})
+    return True
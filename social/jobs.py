@@ -0,0 +1,169 @@
+import logging
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Background jobs
+# -----------------------------------------------
+# Slow write-side work (image variants, Markdown rendering, timeline fan-out,
+# counter reconciliation) is queued as Job rows in the main database and run
+# by `manage.py run_jobs`, so request handlers only pay for one INSERT.
+# Handlers re-read their rows by id; work whose row has since been deleted
+# becomes a no-op.
+#
+#   @register('timeline.fan_out_post')
+#   def fan_out_post(post_id): ...
+#
+#   jobs.enqueue('timeline.fan_out_post', key=f'fanout:post:{pk}', post_id=pk)
+#
+# Payloads are JSON kwargs. A `key` makes enqueueing idempotent: the same key
+# only ever yields one job (a failed one is re-queued). With rerun=True a
+# finished one is re-queued too, for keys that can come back after their job
+# ran (a body edited A -> B -> A must be rendered again). Handlers must cope
+# with running more than once: a worker that dies mid-job has its jobs
+# picked up again after SOCIAL_JOBS_TIMEOUT.
+#
+# With SOCIAL_JOBS_EAGER (opt-in, and on for the test suite) enqueue() runs
+# the handler inline and lets exceptions propagate; no Job row is written.
+
+REGISTRY = {}  # job name -> handler
+MAX_ATTEMPTS = {}  # job name -> attempts before a job is marked failed
+
+
+def eager():
+    return getattr(settings, 'SOCIAL_JOBS_EAGER', False)
+
+
+def job_timeout():
+    return getattr(settings, 'SOCIAL_JOBS_TIMEOUT', 600)
+
+
+def periodic():
+    """{job name: interval in seconds} scheduled by the worker."""
+    return getattr(settings, 'SOCIAL_JOBS_PERIODIC', {})
+
+
+def register(name, max_attempts=3):
+    def decorator(func):
+        REGISTRY[name], MAX_ATTEMPTS[name] = func, max_attempts
+        return func
+    return decorator
+
+
+def enqueue(name, key=None, delay=0, rerun=False, **payload):
+    """Queue job ``name`` with ``payload``; returns the Job (None when eager)."""
+    if name not in REGISTRY:
+        raise KeyError(f"Unknown job: {name}")
+    if eager():
+        REGISTRY[name](**payload)
+        return None
+    return _store(name, key, payload, delay, rerun)
+
+
+def _store(name, key, payload, delay=0, rerun=False):
+    fields = {
+        'name': name, 'payload': payload,
+        'max_attempts': MAX_ATTEMPTS[name],
+        'run_after': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    job, created = Job.objects.get_or_create(key=key, defaults=fields)
+    again = [Job.FAILED, Job.DONE] if rerun else [Job.FAILED]
+    if not created and job.status in again:
+        Job.objects.filter(pk=job.pk, status__in=again).update(
+            status=Job.QUEUED, attempts=0, last_error='', finished_at=None, **fields,
+        )
+        job.refresh_from_db()
+    return job
+
+
+# Worker side
+# -----------------------------------------------
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts`` (10s, 40s, 90s, ...)."""
+    return 10 * attempts ** 2
+
+
+def claim(limit):
+    """Atomically take up to ``limit`` due jobs for this worker.
+
+    The status=queued guard on the UPDATE keeps two workers (threads or
+    processes) from claiming the same row; each claim gets its own token.
+    """
+    token, now = uuid.uuid4().hex, timezone.now()
+    due = list(Job.objects
+               .filter(status=Job.QUEUED, run_after__lte=now)
+               .order_by('run_after', 'id')
+               .values_list('id', flat=True)[:limit])
+    if not due:
+        return []
+    Job.objects.filter(id__in=due, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_after', 'id'))
+
+
+def run(job):
+    """Run a claimed job and record the outcome; returns True on success."""
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            REGISTRY[job.name](**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error("Job %s (%s) failed for good:\n%s", job.pk, job.name, error)
+            mine.update(status=Job.FAILED, last_error=error, finished_at=timezone.now())
+        else:
+            logger.warning("Job %s (%s) failed, will retry:\n%s", job.pk, job.name, error)
+            mine.update(status=Job.QUEUED, last_error=error,
+                        run_after=timezone.now() + timedelta(seconds=backoff(job.attempts)))
+        return False
+    mine.update(status=Job.DONE, finished_at=timezone.now())
+    return True
+
+
+def requeue_stale():
+    """Hand jobs of workers that died mid-run back to the queue.
+
+    The run that never finished counts as an attempt (claim() took it), so a
+    job that keeps hanging or killing its worker ends up failed like any other.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=job_timeout()))
+    error = f"Worker did not finish within {job_timeout()}s"
+    for job in stale.filter(attempts__gte=F('max_attempts')).only('pk', 'name'):
+        logger.error("Job %s (%s) failed for good: %s", job.pk, job.name, error)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error=error, finished_at=now,
+    )
+    return stale.update(status=Job.QUEUED, last_error=error)
+
+
+def schedule_periodic():
+    """Queue one run of each periodic job per interval.
+
+    The interval slot is part of the idempotency key, so any number of
+    workers polling at once still queue a single run.
+    """
+    for name, every in periodic().items():
+        slot = int(time.time() // every)
+        _store(name, f'periodic:{name}:{slot}', {})
+
+
+@register('jobs.prune')
+def prune(days=7):
+    """Delete finished jobs older than ``days`` (their keys become reusable)."""
+    cutoff = timezone.now() - timedelta(days=days)
+    Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .counters import post_counters
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Live updates
+# -----------------------------------------------
+# An open feed keeps an EventSource on the live stream
+# (async_views.live_stream, ASGI only), so other people's activity shows up
+# without reloading the page. Writers call publish() with a small JSON event;
+# once the transaction commits, the backend carries it to every process
+# (LocalBackend: this one only; RedisBackend: every process on the channel)
+# and the Hub there hands it to the matching streams:
+#
+#   post    {post, author}                  the author and their followers;
+#                                           the page fetches the post-card view
+#   counts  {post, likes_count, ...}        everyone (pages without the card ignore it)
+#   reply   {post, reply, html, ...counts}  everyone
+#   follow  {user, target, username, ...}   that user; also moves the target's
+#                                           posts in or out of their streams
+#
+# Events are not stored: a stream only sees what happens while it is open. A
+# stream holds at most SOCIAL_LIVE_QUEUE_SIZE undelivered events; one that
+# falls further behind gets a single `resync` instead.
+
+COUNT_FIELDS = ('likes_count', 'dislikes_count', 'shares_count', 'reply_count')
+
+
+def queue_size():
+    return getattr(settings, 'SOCIAL_LIVE_QUEUE_SIZE', 100)
+
+
+def keepalive():
+    """Seconds between comments on an idle stream (keeps proxies from closing it)."""
+    return getattr(settings, 'SOCIAL_LIVE_KEEPALIVE', 15)
+
+
+# -----------------------
+# Backends
+# -----------------------
+class LocalBackend:
+    """Events reach the streams of this process only (one ASGI worker, development)."""
+
+    def __init__(self):
+        self.dispatch = None
+
+    def listen(self, dispatch):
+        self.dispatch = dispatch
+
+    def publish(self, event):
+        if self.dispatch is not None:
+            self.dispatch(event)
+
+    def close(self):
+        self.dispatch = None
+
+
+class RedisBackend:
+    """Redis pub/sub: events reach the streams of every process on the channel.
+
+    Needs the `redis` package; connects to REDIS_URL.
+    """
+
+    channel = 'devcentral:live'
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured("RedisBackend needs the `redis` package") from exc
+        self.client = redis.Redis.from_url(os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'))
+        self._pubsub = self._thread = None
+
+    def listen(self, dispatch):
+        def handle(message):
+            try:
+                dispatch(json.loads(message['data']))
+            except Exception:
+                logger.exception("Bad live event on %s", self.channel)
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: handle})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, event):
+        self.client.publish(self.channel, json.dumps(event))
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._pubsub.close()
+        self._pubsub = self._thread = None
+
+
+def load_backend():
+    path = getattr(settings, 'SOCIAL_LIVE_BACKEND', 'social.live.LocalBackend')
+    try:
+        return import_string(path)()
+    except ImportError as exc:
+        raise ImproperlyConfigured(f"Cannot load live backend {path!r}: {exc}") from exc
+
+
+# -----------------------
+# Hub
+# -----------------------
+class Subscription:
+    """One open stream: its viewer, whose posts they get, and their pending events."""
+
+    def __init__(self, user_id, followed):
+        self.user_id = user_id
+        self.followed = set(followed)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def wants(self, event):
+        kind = event['type']
+        if kind == 'post':
+            return event['author'] == self.user_id or event['author'] in self.followed
+        if kind == 'follow':
+            if event['user'] != self.user_id:
+                return False
+            if event['following']:
+                self.followed.add(event['target'])
+            else:
+                self.followed.discard(event['target'])
+        return True
+
+    def deliver(self, event):
+        # called from whichever thread published; the queue belongs to the loop
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # loop closed: the stream is gone
+
+    def _put(self, event):
+        if self.queue.qsize() >= queue_size():
+            # too far behind to catch up event by event
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': 'resync'}
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Hub:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._backend = None
+        self._listening = False
+
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = load_backend()
+            return self._backend
+
+    def publish(self, event):
+        self.backend().publish(event)
+
+    def dispatch(self, event):
+        """Hand ``event`` to the matching streams in this process."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for sub in subscriptions:
+            if sub.wants(event):
+                sub.deliver(event)
+
+    @contextmanager
+    def subscribe(self, user_id, followed):
+        backend = self.backend()
+        sub = Subscription(user_id, followed)
+        with self._lock:
+            if not self._listening:
+                backend.listen(self.dispatch)
+                self._listening = True
+            self._subscriptions.add(sub)
+        try:
+            yield sub
+        finally:
+            with self._lock:
+                self._subscriptions.discard(sub)
+
+    def listeners(self):
+        return len(self._subscriptions)
+
+    def close(self):
+        """Stop listening and forget the backend (picked again on next use)."""
+        with self._lock:
+            if self._backend is not None:
+                self._backend.close()
+            self._backend, self._listening = None, False
+
+
+hub = Hub()
+
+
+# -----------------------
+# Publishing
+# -----------------------
+def publish(event):
+    """Send ``event`` to the matching live streams once the transaction commits.
+
+    ``event`` may be a function returning it, to read state after the commit.
+    """
+    def send():
+        try:
+            hub.publish(event() if callable(event) else event)
+        except Exception:
+            # live updates are best effort; the write itself has happened
+            logger.exception("Live event not sent")
+    transaction.on_commit(send)
+
+
+def post_counts(pk):
+    """Current counters of post ``pk`` (pending write-behind increments included)."""
+    post = Post.objects.only(*COUNT_FIELDS).filter(pk=pk).first()
+    if post is None:
+        return dict.fromkeys(COUNT_FIELDS, 0)
+    post_counters.overlay([post])
+    return {field: getattr(post, field) for field in COUNT_FIELDS}
+
+
+def counts_changed(pk):
+    """Publish post ``pk``'s counters; returns them."""
+    counts = post_counts(pk)
+    publish({'type': 'counts', 'post': pk, **counts})
+    return counts
+
+
+def reply_html(reply):
+    return render_to_string('social/_reply_item.html', {'r': reply})
+
+
+def new_post(post):
+    publish({'type': 'post', 'post': post.pk, 'author': post.author_id})
+
+
+def new_reply(reply):
+    html = reply_html(reply)
+    publish(lambda: {'type': 'reply', 'post': reply.post_id, 'reply': reply.pk, 'html': html,
+                     **post_counts(reply.post_id)})
+
+
+def follow_changed(user, target, following):
+    publish({'type': 'follow', 'user': user.pk, 'target': target.pk,
+             'username': target.username, 'following': following})
+
+
+def format_event(event):
+    """``event`` as one Server-Sent Events message."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from social import bench
+
+User = get_user_model()
+
+SERVERS = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = ("Compare the WSGI page views with the async ones on the ASGI stack under "
+            "concurrent load: throughput and p50/p99 latency for the feed, a profile and "
+            "explore, against a seeded scratch SQLite file. The real database is never touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Requests in flight at once (default: 16).")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per page per server (default: 200).")
+        parser.add_argument('--posts', type=int, default=2000, help="Posts seeded before the run.")
+        parser.add_argument('--follows', type=int, default=50, help="Authors the viewer follows.")
+        parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+        # internal: one server's run, in a child process (urls.py picks the
+        # views at import time, so each stack needs its own process)
+        parser.add_argument('--child', choices=SERVERS, help='==SUPPRESS==')
+        parser.add_argument('--database-file', help='==SUPPRESS==')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.child(options)
+
+        workdir = tempfile.mkdtemp(prefix='bench_async_')
+        try:
+            template = os.path.join(workdir, 'template.sqlite3')
+            self.stdout.write("Building scratch database…")
+            bench.use_scratch_db(template)
+            call_command('migrate', verbosity=0)
+            bench.seed(options['posts'], follows=options['follows'], prefix='bench_async')
+            connections.close_all()
+
+            results = {}
+            for server in options['servers']:
+                path = os.path.join(workdir, f'{server}.sqlite3')
+                shutil.copyfile(template, path)
+                self.stdout.write(f"Running {server}…")
+                results[server] = self.spawn(server, path, options)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        self.report(results, options['concurrency'])
+
+    def spawn(self, server, path, options):
+        env = {**os.environ,
+               'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+               'SOCIAL_ASYNC_VIEWS': '1' if server == 'asgi' else '0'}
+        cmd = [sys.executable, '-m', 'django', 'bench_async', '--child', server,
+               '--database-file', path,
+               '--concurrency', str(options['concurrency']),
+               '--requests', str(options['requests'])]
+        out = subprocess.run(cmd, env=env, cwd=settings.BASE_DIR, check=True,
+                             capture_output=True, text=True).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+    # -----------------------
+    # Child process
+    # -----------------------
+    def child(self, options):
+        bench.use_scratch_db(options['database_file'])
+        # no query log, like production
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['testserver']
+
+        viewer = User.objects.get(username='bench_async_viewer')
+        author = User.objects.filter(username__startswith='bench_async_author').order_by('pk').first()
+        login = Client()
+        login.force_login(viewer)
+        cookies = login.cookies
+        connection.close()
+
+        urls = {
+            'feed': reverse('social:feed'),
+            'profile': reverse('social:profile', args=[author.username]),
+            'explore': reverse('social:explore'),
+        }
+        run = self.run_asgi if options['child'] == 'asgi' else self.run_wsgi
+        results = {name: run(url, cookies, options['concurrency'], options['requests'])
+                   for name, url in urls.items()}
+        self.stdout.write(json.dumps(results))
+
+    def run_wsgi(self, url, cookies, concurrency, requests):
+        # a threaded WSGI server: one request per worker thread at a time
+        local = threading.local()
+
+        def hit(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.cookies = cookies
+            return self.timed(local.client.get, url)
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(hit, range(concurrency)))  # warm up connections and caches
+            started = time.monotonic()
+            latencies = list(pool.map(hit, range(requests)))
+            elapsed = time.monotonic() - started
+        connections.close_all()
+        return self.summary(latencies, elapsed)
+
+    def run_asgi(self, url, cookies, concurrency, requests):
+        async def main():
+            clients = []
+            for _ in range(concurrency):
+                client = AsyncClient()
+                client.cookies = cookies
+                clients.append(client)
+            queue = asyncio.Queue()
+
+            async def worker(client, latencies):
+                while not queue.empty():
+                    queue.get_nowait()
+                    started = time.monotonic()
+                    response = await client.get(url)
+                    assert response.status_code == 200, response.status_code
+                    latencies.append(time.monotonic() - started)
+
+            async def batch(n):
+                for i in range(n):
+                    queue.put_nowait(i)
+                latencies = []
+                await asyncio.gather(*(worker(c, latencies) for c in clients))
+                return latencies
+
+            await batch(concurrency)
+            started = time.monotonic()
+            latencies = await batch(requests)
+            return latencies, time.monotonic() - started
+
+        latencies, elapsed = asyncio.run(main())
+        return self.summary(latencies, elapsed)
+
+    @staticmethod
+    def timed(get, url):
+        started = time.monotonic()
+        response = get(url)
+        assert response.status_code == 200, response.status_code
+        return time.monotonic() - started
+
+    @staticmethod
+    def summary(latencies, elapsed):
+        latencies = sorted(latencies)
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        }
+
+    def report(self, results, concurrency):
+        self.stdout.write(f"\n{concurrency} concurrent requests")
+        header = f"{'page':<10}{'server':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        pages = next(iter(results.values()), {})
+        for page in pages:
+            for server, r in results.items():
+                m = r[page]
+                self.stdout.write(f"{page:<10}{server:<8}{m['rps']:>10.1f}{m['p50']:>10.1f}{m['p99']:>10.1f}")
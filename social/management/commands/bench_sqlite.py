@@ -0,0 +1,112 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test.utils import override_settings
+
+from social import bench, reactions, timeline
+from social.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Hammer a scratch SQLite file with concurrent posting, reacting and feed reads "
+            "under each SQLite mode in settings.SQLITE_MODES and report throughput and "
+            "'database is locked' errors. The real database is never touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', default=list(settings.SQLITE_MODES),
+                            help="Modes to compare (default: all of settings.SQLITE_MODES).")
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent workers (default: 8).")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration per mode (default: 5).")
+        parser.add_argument('--posts', type=int, default=500, help="Posts seeded before the run.")
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+        db = connection.settings_dict
+        saved = {key: db.get(key) for key in ('NAME', 'OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        try:
+            template = os.path.join(workdir, 'template.sqlite3')
+            self.stdout.write("Building scratch database…")
+            bench.use_scratch_db(template, 'basic')
+            call_command('migrate', verbosity=0)
+            users = self.seed(options['threads'], options['posts'])
+            connection.close()
+
+            results = {}
+            for mode in options['modes']:
+                path = os.path.join(workdir, f'{mode}.sqlite3')
+                shutil.copyfile(template, path)
+                bench.use_scratch_db(path, mode)
+                results[mode] = self.run(users, options['threads'], options['seconds'])
+                connections.close_all()
+        finally:
+            connections.close_all()
+            db.update(saved)
+            shutil.rmtree(workdir, ignore_errors=True)
+        self.report(results)
+
+    def seed(self, workers, posts):
+        users = [User.objects.create_user(f'bench_sqlite{i}') for i in range(workers)]
+        Post.objects.bulk_create([
+            Post(author=users[i % workers], body=f'seed post {i}') for i in range(posts)
+        ])
+        return [u.pk for u in users]
+
+    def run(self, user_ids, threads, seconds):
+        counts = {'writes': 0, 'reads': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+
+        def worker(user_id):
+            user = User.objects.get(pk=user_id)
+            done = {'writes': 0, 'reads': 0, 'errors': 0}
+            while time.monotonic() < deadline:
+                roll = random.random()
+                try:
+                    if roll < 0.25:
+                        timeline.publish(Post.objects.create(author=user, body='bench post'))
+                        done['writes'] += 1
+                    elif roll < 0.75:
+                        reactions.toggle(user, random.choice(post_ids), 'like')
+                        done['writes'] += 1
+                    else:
+                        timeline.timeline_page(user, None, 20)
+                        done['reads'] += 1
+                except OperationalError:
+                    done['errors'] += 1
+                # a request boundary: with CONN_MAX_AGE=0 this reconnects
+                close_old_connections()
+            connection.close()
+            with lock:
+                for key, n in done.items():
+                    counts[key] += n
+
+        # write-through counters, so every reaction is a real write
+        with override_settings(SOCIAL_COUNTER_FLUSH_INTERVAL=0):
+            pool = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids[:threads]]
+            started = time.monotonic()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.monotonic() - started
+        return {**counts, 'seconds': elapsed}
+
+    def report(self, results):
+        header = f"{'mode':<12}{'ops/s':>10}{'writes':>10}{'reads':>10}{'locked':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for mode, r in results.items():
+            ops = (r['writes'] + r['reads']) / r['seconds']
+            self.stdout.write(f"{mode:<12}{ops:>10.1f}{r['writes']:>10}{r['reads']:>10}{r['errors']:>10}")
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from social import bench, members
+
+
+class Command(BaseCommand):
+    help = ("Seed synthetic data at several scales into a throwaway test database, "
+            "hit every watched view and report query count and wall time. "
+            "Fails if any view's query count changes with data size.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[100, 10_000, 100_000],
+                            help="Post counts to seed (default: 100 10000 100000).")
+        parser.add_argument('--follows', type=int, default=1000,
+                            help="Authors the viewer follows (default: 1000).")
+        parser.add_argument('--replies', type=int, default=1, help="Replies per post.")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Requests per view; the best wall time is reported.")
+
+    def handle(self, *args, **options):
+        # Never touch the real database: build (and later drop) a test one.
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = {scale: self.run_scale(scale, options) for scale in options['scales']}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+
+    def run_scale(self, scale, options):
+        call_command('flush', interactive=False, verbosity=0)
+        self.stdout.write(f"Seeding {scale} posts…")
+        data = bench.seed(scale, follows=options['follows'], replies_per_post=options['replies'])
+        client = Client()
+        client.force_login(data['viewer'])
+        # every scale starts cold, or it would ride on the previous one's caches
+        cache.clear()
+        members.index.reset()
+
+        rows = {}
+        for name, method, url in bench.scenarios(data):
+            runs = [bench.measure(client, method, url) for _ in range(options['repeat'])]
+            status = runs[0][0]
+            if status >= 400:
+                raise CommandError(f"{name} returned HTTP {status} at scale {scale}")
+            rows[name] = (max(r[1] for r in runs), min(r[2] for r in runs))
+        return rows
+
+    def report(self, results):
+        scales = list(results)
+        names = list(results[scales[0]])
+        header = f"{'view':<10}" + ''.join(f"{f'{s} posts':>22}" for s in scales)
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        growing = []
+        for name in names:
+            cells = [results[s][name] for s in scales]
+            self.stdout.write(f"{name:<10}" + ''.join(f"{q:>8} q {t * 1000:>9.1f} ms" for q, t in cells))
+            if len({q for q, _ in cells}) > 1:
+                growing.append(name)
+
+        if growing:
+            raise CommandError(f"Query count grows with data size for: {', '.join(growing)}")
+        self.stdout.write(self.style.SUCCESS("Query counts are flat across all scales."))
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pygments.formatters import HtmlFormatter
+from pygments.util import ClassNotFound
+
+from social.utils import HIGHLIGHT_CSS_CLASS
+
+OUTPUT = Path(__file__).resolve().parents[2] / 'static' / 'css' / 'pygments.css'
+
+
+class Command(BaseCommand):
+    help = "Write the shared Pygments theme (static/css/pygments.css) for server-highlighted code."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--style', default=getattr(settings, 'SOCIAL_PYGMENTS_STYLE', 'github-dark'))
+
+    def handle(self, *args, **options):
+        try:
+            formatter = HtmlFormatter(style=options['style'])
+        except ClassNotFound as exc:
+            raise CommandError(str(exc)) from exc
+        # .codehilite: Markdown HTML stored before the class was unified
+        selectors = [f'.{HIGHLIGHT_CSS_CLASS}', '.codehilite']
+        css = formatter.get_style_defs(selectors)
+        header = (f"/* Generated by `manage.py build_pygments_css --style {options['style']}`; "
+                  f"do not edit by hand. */\n")
+        OUTPUT.write_text(header + css + '\n')
+        self.stdout.write(f"Wrote {OUTPUT} ({options['style']}).")
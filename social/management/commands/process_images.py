@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from social import images
+from social.models import Post, Profile
+
+TARGETS = (
+    (Profile, 'avatar', 'avatar_variants', 'avatar'),
+    (Post, 'image', 'image_variants', 'post'),
+)
+
+
+class Command(BaseCommand):
+    help = "Generate responsive WebP variants for avatars and post images uploaded before the pipeline existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true', help="Rebuild variants even when they look current.")
+
+    def handle(self, *args, **options):
+        for model, field, variants_field, kind in TARGETS:
+            built, last_pk = 0, 0
+            while True:
+                rows = list(model.objects
+                            .filter(pk__gt=last_pk)
+                            .exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                            .order_by('pk')
+                            .only('pk', field, variants_field)[:options['batch_size']])
+                if not rows:
+                    break
+                last_pk = rows[-1].pk
+                built += sum(images.refresh(r, field, variants_field, kind, force=options['force']) for r in rows)
+            self.stdout.write(f"{model.__name__}: built variants for {built} row(s).")
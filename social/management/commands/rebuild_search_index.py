@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from social import search
+
+
+class Command(BaseCommand):
+    help = "Re-index every post, reply and code snippet for full-text search."
+
+    def handle(self, *args, **options):
+        count = search.backend().rebuild()
+        self.stdout.write(f"Indexed {count} document(s).")
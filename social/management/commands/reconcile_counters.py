@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from social.reconcile import RECONCILERS
+
+
+class Command(BaseCommand):
+    help = ("Recompute denormalized counters from their source tables, in batches, and fix any drift. "
+            "Post counters still buffered by web workers can't be flushed from here, so drifting "
+            "posts are re-checked after two SOCIAL_COUNTER_FLUSH_INTERVALs and only fixed if the "
+            "drift remains.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*',
+                            help=f"Counters to check (default: all of {', '.join(RECONCILERS)}).")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(RECONCILERS)
+        if unknown:
+            raise CommandError(f"Unknown counter(s): {', '.join(sorted(unknown))}")
+        for name in options['targets'] or RECONCILERS:
+            fixed = RECONCILERS[name](batch_size=options['batch_size'], dry_run=options['dry_run'])
+            verb = "would fix" if options['dry_run'] else "fixed"
+            self.stdout.write(f"{name}: {verb} {fixed} row(s).")
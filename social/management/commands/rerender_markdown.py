@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from social import fragments
+from social.models import CodeSnippet, Post, Reply
+from social.utils import ensure_highlighted, ensure_rendered
+
+
+class Command(BaseCommand):
+    help = ("Re-render stored Markdown HTML for posts and replies, and highlighted HTML for code "
+            "snippets, whose content hash or renderer version is stale.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help="Re-render every row, stale or not.")
+
+    def handle(self, *args, **options):
+        for model, card in ((Post, 'pk'), (Reply, 'post_id')):
+            updated = self.rerender(model, options['batch_size'], options['force'], card=card)
+            self.stdout.write(f"{model.__name__}: re-rendered {updated} row(s).")
+        updated = self.rerender(CodeSnippet, options['batch_size'], options['force'],
+                                ensure_highlighted, ('code', 'language', 'highlighted_html', 'highlighted_key'))
+        self.stdout.write(f"CodeSnippet: re-highlighted {updated} row(s).")
+
+    def rerender(self, model, batch_size, force, ensure=ensure_rendered,
+                 fields=('body', 'rendered_html', 'rendered_key'), card=None):
+        # Walk by primary key so each batch is a cheap range scan.
+        # ``card`` names the field holding the post whose cached card shows
+        # the row; bulk_update skips the signals that would retire it.
+        updated, last_pk = 0, 0
+        while True:
+            rows = list(model.objects
+                        .filter(pk__gt=last_pk)
+                        .order_by('pk')
+                        .only('pk', *fields, *([card] if card else []))[:batch_size])
+            if not rows:
+                return updated
+            last_pk = rows[-1].pk
+            stale = [r for r in rows if ensure(r, force=force)]
+            model.objects.bulk_update(stale, list(fields[-2:]))
+            if card and stale:
+                fragments.invalidate(*{getattr(r, card) for r in stale})
+            updated += len(stale)
@@ -0,0 +1,51 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from social import jobs
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs. Claims are atomic, so several run_jobs "
+            "processes can share the queue for more parallelism.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=getattr(settings, 'SOCIAL_JOBS_THREADS', 4))
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the jobs that are due, then exit.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        threads = max(1, options['threads'])
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') as pool:
+            while not self.stopping:
+                jobs.requeue_stale()
+                if not options['once']:
+                    jobs.schedule_periodic()
+                claimed = jobs.claim(threads * 2)
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                for ok in pool.map(self.run_one, claimed):
+                    done, failed = done + ok, failed + (not ok)
+        self.stdout.write(f"Ran {done + failed} job(s): {done} ok, {failed} failed.")
+
+    def run_one(self, job):
+        try:
+            return jobs.run(job)
+        finally:
+            # pool threads are long-lived; don't keep a connection per thread open
+            connection.close()
+
+    def stop(self, *args):
+        self.stopping = True
@@ -0,0 +1,136 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .caching import Namespace
+from .follows import followed_ids
+
+User = get_user_model()
+
+# Member directory
+# -----------------------------------------------
+# Usernames live in an in-process sorted index of (lowercased name, id), so
+# typeahead and the directory's prefix filter are a binary search instead of
+# a LIKE scan over auth_user, and directory pages are keyset slices of it.
+#
+# The index is built on first use and then kept current incrementally:
+# signals add/remove users as this process creates/deletes them, and every
+# SOCIAL_MEMBER_INDEX_REFRESH seconds a catch-up query picks up signups made
+# by other workers (ids above the highest one seen). Deletions elsewhere are
+# noticed by the row count drifting, which triggers a full rebuild. Callers
+# re-read the rows for a page anyway, so a briefly stale entry just drops out.
+#
+# The feed's left rail shows a few "suggested members" (most followed people
+# the viewer doesn't follow yet) from a short-lived cached list.
+
+member_cache = Namespace('members', timeout=600)
+
+
+def refresh_interval():
+    return getattr(settings, 'SOCIAL_MEMBER_INDEX_REFRESH', 60)
+
+
+class MemberIndex:
+    def __init__(self):
+        self._keys = []  # sorted (lowercased username, id)
+        self._names = {}  # id -> username
+        self._max_id = 0
+        self._checked = None  # time.monotonic() of the last catch-up
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        rows = User.objects.order_by('pk').values_list('pk', 'username')
+        self._names = dict(rows.iterator(chunk_size=5000))
+        self._keys = sorted((name.lower(), pk) for pk, name in self._names.items())
+        self._max_id = max(self._names, default=0)
+        self._checked = time.monotonic()
+
+    def _catch_up(self):
+        if self._checked is None:
+            return self._rebuild()
+        if time.monotonic() - self._checked < refresh_interval():
+            return
+        for pk, name in User.objects.filter(pk__gt=self._max_id).values_list('pk', 'username'):
+            self._insert(pk, name)
+        if User.objects.count() != len(self._names):
+            return self._rebuild()
+        self._checked = time.monotonic()
+
+    def _insert(self, pk, username):
+        self._remove(pk)
+        self._names[pk] = username
+        insort(self._keys, (username.lower(), pk))
+        self._max_id = max(self._max_id, pk)
+
+    def _remove(self, pk):
+        name = self._names.pop(pk, None)
+        if name is not None:
+            key = (name.lower(), pk)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    # called from signals
+    def add(self, pk, username):
+        with self._lock:
+            if self._checked is not None:
+                self._insert(pk, username)
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    def reset(self):
+        with self._lock:
+            self._checked = None
+
+    def page(self, prefix='', after=None, size=50):
+        """Up to ``size`` (id, username) whose names start with ``prefix``.
+
+        Case-insensitive, in name order. ``after`` is the (lowercased name,
+        id) keyset cursor of the previous page. Returns (rows, next_cursor).
+        """
+        prefix = prefix.lower()
+        with self._lock:
+            self._catch_up()
+            start = bisect_left(self._keys, (prefix, 0))
+            if after:
+                start = max(start, bisect_right(self._keys, tuple(after)))
+            keys = []
+            for key in self._keys[start:start + size + 1]:
+                if not key[0].startswith(prefix):
+                    break
+                keys.append(key)
+            rows = [(pk, self._names[pk]) for _, pk in keys[:size]]
+        return rows, (keys[size - 1] if len(keys) > size else None)
+
+
+index = MemberIndex()
+
+
+def load(ids):
+    """Users for ``ids``, in that order (rows deleted since are skipped)."""
+    users = User.objects.select_related('profile').in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
+
+
+def typeahead(prefix, limit=8):
+    """Usernames starting with ``prefix``, straight from the index."""
+    rows, _ = index.page(prefix, size=limit)
+    return [name for _, name in rows]
+
+
+def suggested(user, size=None):
+    """A few well-followed members ``user`` doesn't follow yet."""
+    size = size or getattr(settings, 'SOCIAL_SUGGESTED_MEMBERS', 8)
+    # one shared list for everyone; each viewer filters out themselves and
+    # the people they already follow
+    pool = member_cache.get_or_set(('suggested', size), lambda: list(
+        User.objects.select_related('profile')
+        .order_by('-profile__follower_count', '-pk')[:size * 4]
+    ))
+    skip = followed_ids(user) | {user.pk}
+    return [m for m in pool if m.pk not in skip][:size]
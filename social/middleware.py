@@ -0,0 +1,54 @@
+from contextvars import copy_context
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import routers
+
+
+class ReadYourWritesMiddleware:
+    """Keep a browser's reads on the primary for a moment after it writes.
+
+    Each request runs with a fresh routing pin (social.routers). A request
+    arriving with the sticky cookie starts pinned; a request that wrote sets
+    the cookie for SOCIAL_DB_STICKY_SECONDS, about the replicas' lag, so the
+    redirect after a POST shows what was just saved.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # a copied context keeps one request's pin from leaking into the
+        # next request handled by the same thread
+        return copy_context().run(self.handle, request)
+
+    def handle(self, request):
+        self.start(request)
+        return self.finish(self.get_response(request))
+
+    async def __acall__(self, request):
+        # under ASGI every request already runs in its own task (and context)
+        self.start(request)
+        return self.finish(await self.get_response(request))
+
+    def start(self, request):
+        routers.reset()
+        if request.COOKIES.get(self.cookie_name()):
+            routers.pin()
+
+    def finish(self, response):
+        if routers.wrote() and routers.replicas():
+            response.set_cookie(self.cookie_name(), '1', max_age=routers.sticky_seconds(),
+                                httponly=True, samesite='Lax')
+        return response
+
+    @staticmethod
+    def cookie_name():
+        return getattr(settings, 'SOCIAL_DB_STICKY_COOKIE', 'primary_db')
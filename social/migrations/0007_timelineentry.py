@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_timelines(apps, schema_editor):
+    # Seed timelines for existing data: every post goes to its author and
+    # to everyone following the author.
+    Post = apps.get_model('social', 'Post')
+    Profile = apps.get_model('social', 'Profile')
+    TimelineEntry = apps.get_model('social', 'TimelineEntry')
+
+    followers = {}
+    for profile in Profile.objects.prefetch_related('followers'):
+        followers[profile.user_id] = [u.pk for u in profile.followers.all()]
+
+    batch = []
+    for post in Post.objects.only('id', 'author_id', 'created_at').iterator():
+        # dict.fromkeys: authors may appear in their own follower list
+        for uid in dict.fromkeys([post.author_id, *followers.get(post.author_id, [])]):
+            batch.append(TimelineEntry(user_id=uid, post_id=post.pk,
+                                       author_id=post.author_id, created_at=post.created_at))
+        if len(batch) >= 1000:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0006_post_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='social.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'), models.Index(fields=['user', 'author'], name='timeline_user_author_idx')],
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.RunPython(build_timelines, migrations.RunPython.noop),
+    ]
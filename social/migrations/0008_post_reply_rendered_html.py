@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+def render_existing(apps, schema_editor):
+    # Existing bodies would show as plain text until someone ran
+    # `manage.py rerender_markdown`; render them now.
+    from social.utils import ensure_rendered
+
+    for name in ('Post', 'Reply'):
+        model = apps.get_model('social', name)
+        batch = []
+        for row in model.objects.iterator():
+            ensure_rendered(row)
+            batch.append(row)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, ['rendered_html', 'rendered_key'])
+                batch = []
+        model.objects.bulk_update(batch, ['rendered_html', 'rendered_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0007_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rendered_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rendered_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='rendered_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='rendered_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
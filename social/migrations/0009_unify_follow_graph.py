@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def merge_follow_graphs(apps, schema_editor):
+    # Profile.followers (M2M) and Follow drifted apart; fold the M2M edges
+    # into Follow, then derive both counters from the merged table.
+    Profile = apps.get_model('social', 'Profile')
+    Follow = apps.get_model('social', 'Follow')
+
+    edges = Profile.followers.through.objects.values_list('user_id', 'profile__user_id')
+    m2m_edges = set()
+    batch = []
+    for follower_id, following_id in edges.iterator():
+        if follower_id == following_id:
+            continue
+        m2m_edges.add((follower_id, following_id))
+        batch.append(Follow(follower_id=follower_id, following_id=following_id))
+        if len(batch) >= 1000:
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Follow.objects.bulk_create(batch, ignore_conflicts=True)
+    Follow.objects.filter(follower_id=models.F('following_id')).delete()
+
+    # 0007 built timelines from the M2M only; edges that were only in Follow
+    # still need their posts copied in
+    new_edges = set(Follow.objects.values_list('follower_id', 'following_id')) - m2m_edges
+    backfill_timelines(apps, new_edges)
+
+    def count_of(field):
+        return Coalesce(Subquery(
+            Follow.objects.filter(**{field: OuterRef('user_id')})
+            .order_by().values(field).annotate(n=Count('pk')).values('n')
+        ), 0)
+
+    Profile.objects.update(
+        follower_count=count_of('following_id'),
+        following_count=count_of('follower_id'),
+    )
+
+
+def backfill_timelines(apps, edges):
+    Post = apps.get_model('social', 'Post')
+    TimelineEntry = apps.get_model('social', 'TimelineEntry')
+
+    readers = {}
+    for follower_id, following_id in edges:
+        readers.setdefault(following_id, []).append(follower_id)
+    batch = []
+    posts = Post.objects.filter(author_id__in=readers).only('id', 'author_id', 'created_at')
+    for post in posts.iterator():
+        for uid in readers[post.author_id]:
+            batch.append(TimelineEntry(user_id=uid, post_id=post.pk,
+                                       author_id=post.author_id, created_at=post.created_at))
+        if len(batch) >= 1000:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0008_post_reply_rendered_html'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', 'follower'], name='follow_following_idx'),
+        ),
+        migrations.RunPython(merge_follow_graphs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='profile',
+            name='followers',
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:17
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def keep_one_reaction(apps, schema_editor):
+    # Before the unique constraint a user could hold both a like and a
+    # dislike on a post. Keep their latest reaction and recount those posts.
+    Reaction = apps.get_model('social', 'Reaction')
+    Post = apps.get_model('social', 'Post')
+    dupes = (Reaction.objects
+             .values('post_id', 'user_id')
+             .annotate(n=Count('id'), keep=Max('id'))
+             .filter(n__gt=1))
+    post_ids = set()
+    for row in dupes:
+        (Reaction.objects
+         .filter(post_id=row['post_id'], user_id=row['user_id'])
+         .exclude(pk=row['keep'])
+         .delete())
+        post_ids.add(row['post_id'])
+    for post_id in post_ids:
+        kinds = Reaction.objects.filter(post_id=post_id)
+        Post.objects.filter(pk=post_id).update(
+            likes_count=kinds.filter(kind='like').count(),
+            dislikes_count=kinds.filter(kind='dislike').count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0010_follow_page_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_reaction, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='post',
+            name='dislikes',
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='likes',
+        ),
+        migrations.AlterUniqueTogether(
+            name='reaction',
+            unique_together={('post', 'user')},
+        ),
+    ]
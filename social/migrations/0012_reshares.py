@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def keep_first_share(apps, schema_editor):
+    # Before the unique constraint a user could share a post more than once.
+    # Keep their first share and recount those posts.
+    Share = apps.get_model('social', 'Share')
+    Post = apps.get_model('social', 'Post')
+    dupes = (Share.objects
+             .values('post_id', 'user_id')
+             .annotate(n=Count('id'), keep=Min('id'))
+             .filter(n__gt=1))
+    post_ids = set()
+    for row in dupes:
+        (Share.objects
+         .filter(post_id=row['post_id'], user_id=row['user_id'])
+         .exclude(pk=row['keep'])
+         .delete())
+        post_ids.add(row['post_id'])
+    for post_id in post_ids:
+        Post.objects.filter(pk=post_id).update(shares_count=Share.objects.filter(post_id=post_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0011_one_reaction_per_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_first_share, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='shared_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='share',
+            unique_together={('post', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(fields=['user', '-created_at'], name='share_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'shared_by'], name='timeline_user_sharer_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# FTS5 table behind social.search.SQLiteSearchBackend. rowid = pk * 4 + kind
+# code (post 1, reply 2, snippet 3). prefix='2 3' keeps short prefix queries
+# ("dj*", "pyt*") on an index instead of a term scan.
+CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS social_search USING fts5(
+    title, body, kind UNINDEXED, language UNINDEXED,
+    prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+POPULATE = [
+    "INSERT INTO social_search (rowid, title, body, kind, language) "
+    "SELECT id * 4 + 1, '', body, 'post', '' FROM social_post",
+    "INSERT INTO social_search (rowid, title, body, kind, language) "
+    "SELECT id * 4 + 2, '', body, 'reply', '' FROM social_reply",
+    "INSERT INTO social_search (rowid, title, body, kind, language) "
+    "SELECT id * 4 + 3, title, code, 'snippet', language FROM social_codesnippet",
+]
+
+
+def create_index(apps, schema_editor):
+    # Other databases get their own search backend (and schema) instead.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in [CREATE, *POPULATE]:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS social_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0014_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Trigram FTS5 table behind SQLiteSearchBackend.code_search(); rowid is the
+# CodeSnippet pk. `idents` holds identifiers split into words
+# (social.search.identifier_text).
+CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS social_code_search USING fts5(
+    code, idents, language UNINDEXED, tokenize='trigram'
+)
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from social.search import identifier_text
+
+    schema_editor.execute(CREATE)
+    CodeSnippet = apps.get_model('social', 'CodeSnippet')
+    with schema_editor.connection.cursor() as cur:
+        for s in CodeSnippet.objects.only('id', 'code', 'language').iterator():
+            cur.execute(
+                "INSERT INTO social_code_search (rowid, code, idents, language) VALUES (%s, %s, %s, %s)",
+                [s.pk, s.code, identifier_text(s.code), s.language],
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS social_code_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0015_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
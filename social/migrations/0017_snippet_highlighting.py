@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0016_code_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codesnippet',
+            name='highlighted_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='codesnippet',
+            name='highlighted_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def score_existing(apps, schema_editor):
+    # Every existing post gets a score once; afterwards the periodic job only
+    # touches recent posts.
+    from social.ranking import hot
+
+    Post = apps.get_model('social', 'Post')
+    batch = []
+    for post in Post.objects.annotate(n_replies=Count('replies')).iterator():
+        post.score = hot(post.likes_count, post.dislikes_count, post.shares_count,
+                         post.n_replies, post.created_at)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0017_snippet_highlighting'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-score', '-id'], name='post_score_idx'),
+        ),
+        migrations.RunPython(score_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_replies(apps, schema_editor):
+    Post = apps.get_model('social', 'Post')
+    Reply = apps.get_model('social', 'Reply')
+    counts = (Reply.objects.filter(post_id=OuterRef('pk'))
+              .order_by().values('post_id').annotate(n=Count('pk')).values('n'))
+    Post.objects.update(reply_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0018_post_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['post', '-created_at', '-id'], name='reply_post_created_idx'),
+        ),
+        migrations.RunPython(count_replies, migrations.RunPython.noop),
+    ]
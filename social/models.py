@@ -31,8 +31,14 @@ def post_upload_path(instance, filename):
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     avatar = models.ImageField(upload_to=avatar_upload_path, blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)  # see social.images
     bio = models.CharField(max_length=280, blank=True)
-    followers = models.ManyToManyField(User, related_name="following", blank = True)
+    # Denormalized from Follow (see social.follows); never edit by hand.
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Set once an author outgrows SOCIAL_TIMELINE_FANOUT_LIMIT: their posts are
+    # merged into followers' feeds at read time instead of copied on write.
+    fanout_on_read = models.BooleanField(default=False)
     
     def __str__(self): return self.user.username
 
@@ -42,20 +48,58 @@ class Post(models.Model):
     author = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='posts')
     body = models.TextField(max_length=1000)
     image = models.ImageField(upload_to=post_upload_path, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # see social.images
     created_at = models.DateTimeField(default=timezone.now)
+
+    # Markdown rendered at write time (see utils.ensure_rendered)
+    rendered_html = models.TextField(blank=True, editable=False)
+    rendered_key = models.CharField(max_length=64, blank=True, editable=False)
     
-    # ✅ add these three fields
-    likes = models.ManyToManyField(User, related_name="liked_posts", blank=True)
-    dislikes = models.ManyToManyField(User, related_name="disliked_posts", blank=True)
-    shares_count = models.PositiveIntegerField(default=0)
-    
-    # in social/models.py inside Post model
+    # Counters denormalized from Reaction / Share (see social.reactions)
     likes_count = models.PositiveIntegerField(default=0)
     
     dislikes_count = models.PositiveIntegerField(default=0)
     
     shares_count = models.PositiveIntegerField(default=0)
 
+    reply_count = models.PositiveIntegerField(default=0)  # see social.replies
+
+    # Explore ranking, maintained by social.ranking
+    score = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination: newest-first feeds/profiles walk these
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='post_created_idx'),
+            # ranked Explore pages
+            models.Index(fields=['-score', '-id'], name='post_score_idx'),
+        ]
+
+
+# Timeline entries: precomputed home feed rows (fan-out on write)
+# -----------------------------------------------
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # denormalized from the post so unfollow can trim without a join
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # set when the post reached this timeline as a reshare; created_at is
+    # then the share time, so reshares sort by when they were shared
+    shared_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+            models.Index(fields=['user', 'shared_by'], name='timeline_user_sharer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} ← post {self.post_id}"
+
 
 # Reply model for comments on posts
 # -----------------------------------------------
@@ -64,6 +108,14 @@ class Reply(models.Model):
     author = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     body = models.TextField(max_length=500)
     created_at = models.DateTimeField(default=timezone.now)
+    rendered_html = models.TextField(blank=True, editable=False)
+    rendered_key = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # latest-N previews and thread pages walk a post's replies newest-first
+            models.Index(fields=['post', '-created_at', '-id'], name='reply_post_created_idx'),
+        ]
 
 # Reaction model for likes/dislikes
 # -----------------------------------------------
@@ -74,7 +126,8 @@ class Reaction(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     kind = models.CharField(max_length=7, choices=KIND_CHOICES)
     created_at = models.DateTimeField(default=timezone.now)
-    class Meta: unique_together = ('post','user','kind')
+    # one reaction per user per post; switching like <-> dislike updates `kind`
+    class Meta: unique_together = ('post','user')
 
 # Share model for sharing posts
 # -----------------------------------------------
@@ -83,6 +136,13 @@ class Share(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        unique_together = ('post', 'user')  # a user shares a post once
+        indexes = [
+            # a user's recent reshares (backfilled into new followers' timelines)
+            models.Index(fields=['user', '-created_at'], name='share_user_created_idx'),
+        ]
+
 
 # Create CodeSnippet model for sharing code snippets
 # -----------------------------------------------
@@ -92,6 +152,9 @@ class CodeSnippet(models.Model):
     title = models.CharField(max_length=100, blank=True)
     language = models.CharField(max_length=32, default="python")
     code = models.TextField()
+    # Pygments HTML generated at write time (see utils.ensure_highlighted)
+    highlighted_html = models.TextField(blank=True, editable=False)
+    highlighted_key = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -101,7 +164,7 @@ class CodeSnippet(models.Model):
         return self.title or f"{self.author.username} • {self.language}"
     
     
-# Follow model to manage user follows
+# Follow model: the one and only follow graph (follower → following)
 # -----------------------------------------------
 class Follow(models.Model):
     follower  = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_set')
@@ -109,8 +172,46 @@ class Follow(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # (follower, following) answers "who do I follow";
+        # the reverse index answers "who follows X".
         unique_together = ('follower', 'following')
+        indexes = [
+            models.Index(fields=['following', 'follower'], name='follow_following_idx'),
+            # newest-first keyset pages of someone's followers / following
+            models.Index(fields=['following', '-created_at', '-id'], name='follow_followers_page_idx'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='follow_following_page_idx'),
+        ]
 
     def __str__(self):
         return f"{self.follower} → {self.following}"
 
+
+
+# Background job queue (see social.jobs)
+# -----------------------------------------------
+class Job(models.Model):
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # idempotency key: enqueueing the same key twice yields one job
+    key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's "next due jobs" scan
+            models.Index(fields=['status', 'run_after', 'id'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.status}]"
@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+# Keyset (cursor) pagination helpers
+# -----------------------------------------------
+# A cursor is the sort key of the last row on a page, e.g. (created_at, id),
+# serialized into an opaque URL-safe token. Fetching the next page is then a
+# "WHERE (created_at, id) < (cursor)" range scan instead of an OFFSET, so every
+# page costs the same no matter how deep the reader scrolls.
+
+
+def page_size(setting_name, default):
+    """Read a page size from settings, clamped to something sane."""
+    try:
+        size = int(getattr(settings, setting_name, default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, 200))
+
+
+def encode_cursor(*values):
+    parts = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(parts, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, *types):
+    """Decode a cursor into a tuple of ``types``; return None if it is bogus.
+
+    A bad or tampered cursor just means "start from the top", never a 500.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(parts, list) or len(parts) != len(types):
+            return None
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for t, v in zip(types, parts)
+        )
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def keyset_q(fields, values):
+    """Build the "strictly after this cursor" filter for an ordering.
+
+    ``fields`` is an order_by() style tuple such as ('-created_at', '-id');
+    ``values`` are the cursor values in the same order.
+    """
+    q = Q()
+    for i, field in enumerate(fields):
+        name = field.lstrip('-')
+        op = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{op}': values[i]})
+        for prev, value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev.lstrip('-'): value})
+        q |= step
+    return q
+
+
+def keyset_page(qs, fields, cursor_values, size):
+    """Return (items, next_cursor) for one page of ``qs`` ordered by ``fields``.
+
+    Fetches one extra row to know whether an older page exists.
+    """
+    if cursor_values:
+        qs = qs.filter(keyset_q(fields, cursor_values))
+    items = list(qs.order_by(*fields)[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        next_cursor = encode_cursor(*(getattr(last, f.lstrip('-')) for f in fields))
+    return items, next_cursor
@@ -0,0 +1,66 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Post
+
+# Explore ranking
+# -----------------------------------------------
+# "Hot" score in the style of Reddit's: log10 of net engagement plus a term
+# that grows with creation time, so every SOCIAL_RANK_DECAY_SECONDS of
+# recency is worth 10x the engagement. A post's score therefore only moves
+# when its engagement does; time decay comes from newer posts starting
+# higher. That keeps the stored, indexed Post.score stable between jobs and
+# lets Explore page through it with a (score, id) keyset.
+#
+# New posts get their score on insert (signals.py); the periodic
+# 'explore.rescore' job refreshes posts inside SOCIAL_RANK_WINDOW_DAYS,
+# where nearly all engagement happens. Older posts keep their last score.
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+WEIGHTS = {'likes': 1, 'shares': 2, 'replies': 1, 'dislikes': -1}
+
+
+def decay_seconds():
+    return getattr(settings, 'SOCIAL_RANK_DECAY_SECONDS', 45000)
+
+
+def window():
+    return timedelta(days=getattr(settings, 'SOCIAL_RANK_WINDOW_DAYS', 7))
+
+
+def hot(likes, dislikes, shares, replies, created_at):
+    net = (WEIGHTS['likes'] * likes + WEIGHTS['shares'] * shares
+           + WEIGHTS['replies'] * replies + WEIGHTS['dislikes'] * dislikes)
+    order = math.log10(max(abs(net), 1))
+    sign = (net > 0) - (net < 0)
+    age = (created_at - EPOCH).total_seconds()
+    return round(sign * order + age / decay_seconds(), 7)
+
+
+def score_post(post):
+    return hot(post.likes_count, post.dislikes_count, post.shares_count, post.reply_count, post.created_at)
+
+
+def rescore(since=None, batch_size=500):
+    """Recompute scores for posts created after ``since``; returns rows changed."""
+    since = since or timezone.now() - window()
+    changed, last_pk = 0, 0
+    qs = (Post.objects
+          .filter(created_at__gte=since)
+          .only('pk', 'created_at', 'likes_count', 'dislikes_count', 'shares_count', 'reply_count', 'score'))
+    while True:
+        rows = list(qs.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not rows:
+            return changed
+        last_pk = rows[-1].pk
+        stale = []
+        for post in rows:
+            score = score_post(post)
+            if score != post.score:
+                post.score = score
+                stale.append(post)
+        Post.objects.bulk_update(stale, ['score'])
+        changed += len(stale)
@@ -0,0 +1,69 @@
+from django.db import IntegrityError, transaction
+
+from . import jobs
+from .counters import post_counters
+from .models import Reaction, Share
+
+# Reactions
+# -----------------------------------------------
+# One Reaction row per (post, user). Pressing the same button again removes
+# it; pressing the other one switches it. Post.likes_count / dislikes_count
+# follow through the write-behind counter buffer (social.counters), and a
+# switch queues both deltas together so they land in the same UPDATE.
+
+COUNT_FIELDS = {
+    Reaction.LIKE: 'likes_count',
+    Reaction.DISLIKE: 'dislikes_count',
+}
+
+
+def toggle(user, post_id, kind):
+    """Toggle ``kind`` for ``user`` on a post; return their reaction afterwards (or None)."""
+    try:
+        with transaction.atomic():
+            existing = Reaction.objects.filter(post_id=post_id, user=user).first()
+            if existing is None:
+                Reaction.objects.create(post_id=post_id, user=user, kind=kind)
+                delta, result = {kind: 1}, kind
+            elif existing.kind == kind:
+                existing.delete()
+                delta, result = {kind: -1}, None
+            else:
+                Reaction.objects.filter(pk=existing.pk).update(kind=kind)
+                delta, result = {existing.kind: -1, kind: 1}, kind
+    except IntegrityError:
+        # A concurrent request from the same user (double click) won the
+        # race; theirs stands and ours becomes a no-op.
+        return reactions_for(user, [post_id]).get(post_id)
+    post_counters.add(post_id, **{COUNT_FIELDS[k]: d for k, d in delta.items()})
+    return result
+
+
+def reactions_for(user, post_ids):
+    """{post_id: kind} for the viewer over a page of posts, in one query."""
+    if not user.is_authenticated or not post_ids:
+        return {}
+    return dict(Reaction.objects
+                .filter(user=user, post_id__in=post_ids)
+                .values_list('post_id', 'kind'))
+
+
+def annotate_posts(user, posts):
+    """Set ``post.my_reaction`` ('like' / 'dislike' / None) on each post."""
+    mine = reactions_for(user, [p.pk for p in posts])
+    for p in posts:
+        p.my_reaction = mine.get(p.pk)
+    return posts
+
+
+def share(user, post):
+    """Record ``user`` sharing ``post`` once; returns False if already shared.
+
+    A new share bumps shares_count and is queued for the sharer's followers'
+    timelines as a reshare.
+    """
+    obj, created = Share.objects.get_or_create(post=post, user=user)
+    if created:
+        post_counters.add(post.pk, shares_count=1)
+        jobs.enqueue('timeline.fan_out_share', key=f'fanout:share:{obj.pk}', share_id=obj.pk)
+    return created
@@ -0,0 +1,98 @@
+import time
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .counters import flush_interval, post_counters
+from .models import Follow, Post, Profile, Reaction, Reply, Share
+
+# Counter reconciliation
+# -----------------------------------------------
+# Denormalized counters are maintained incrementally; these functions
+# recompute them from the source tables in primary-key batches and fix any
+# drift. The fix is a single UPDATE ... SET x = (SELECT COUNT ...) per batch,
+# so a follow landing mid-run can't be overwritten with a stale number.
+#
+# Post counters have one more wrinkle: web workers hold increments in memory
+# (social.counters) for up to SOCIAL_COUNTER_FLUSH_INTERVAL, and this
+# process can't flush their buffers. A reaction whose +1 is still buffered
+# looks like drift; "fixing" it would count it twice once the worker
+# flushes. So post drift is only fixed if it is still there after a couple
+# of flush intervals.
+
+
+def _count(model, field, outer='user_id'):
+    return Coalesce(Subquery(
+        model.objects
+        .filter(**{field: OuterRef(outer)})
+        .order_by().values(field)
+        .annotate(n=Count('pk')).values('n')
+    ), 0)
+
+
+def _drifted(queryset, ids, expressions):
+    drift = Q()
+    for field in expressions:
+        drift |= ~Q(**{field: F(f'true_{field}')})
+    return list(queryset.filter(pk__in=ids)
+                .annotate(**{f'true_{field}': expr for field, expr in expressions.items()})
+                .filter(drift)
+                .values_list('pk', flat=True))
+
+
+def _reconcile(queryset, expressions, batch_size, dry_run, settle=0):
+    """Fix rows of ``queryset`` whose fields differ from ``expressions``.
+
+    With ``settle``, rows are re-checked that many seconds after drift is
+    first seen and only fixed if it persists.
+    """
+    fixed, last_pk = 0, 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        last_pk = ids[-1]
+
+        stale = _drifted(queryset, ids, expressions)
+        if stale and settle:
+            time.sleep(settle)
+            stale = _drifted(queryset, stale, expressions)
+        if stale and not dry_run:
+            queryset.filter(pk__in=stale).update(**expressions)
+        fixed += len(stale)
+
+
+def reconcile_profiles(batch_size=500, dry_run=False):
+    """Recompute Profile.follower_count / following_count from Follow."""
+    return _reconcile(Profile.objects.all(), {
+        'follower_count': _count(Follow, 'following_id'),
+        'following_count': _count(Follow, 'follower_id'),
+    }, batch_size, dry_run)
+
+
+def reconcile_posts(batch_size=500, dry_run=False):
+    """Recompute Post.likes_count / dislikes_count / shares_count / reply_count from their source rows."""
+    # Write out this process's buffered increments first, or they would be
+    # added on top of freshly recomputed counts. Other processes' buffers are
+    # waited out instead (see above).
+    post_counters.flush()
+    def reactions(kind):
+        return Coalesce(Subquery(
+            Reaction.objects
+            .filter(post_id=OuterRef('pk'), kind=kind)
+            .order_by().values('post_id')
+            .annotate(n=Count('pk')).values('n')
+        ), 0)
+
+    return _reconcile(Post.objects.all(), {
+        'likes_count': reactions(Reaction.LIKE),
+        'dislikes_count': reactions(Reaction.DISLIKE),
+        'shares_count': _count(Share, 'post_id', outer='pk'),
+        'reply_count': _count(Reply, 'post_id', outer='pk'),
+    }, batch_size, dry_run, settle=2 * flush_interval())
+
+
+RECONCILERS = {
+    'profiles': reconcile_profiles,
+    'posts': reconcile_posts,
+}
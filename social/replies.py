@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Reply
+from .pagination import keyset_page
+
+# Reply threads
+# -----------------------------------------------
+# Post.reply_count is denormalized (kept by signals through the counter
+# buffer), so list pages never count replies. They only preload the latest
+# SOCIAL_REPLY_PREVIEW replies per post, in one window-function query; the
+# rest of a thread is paged in by the post-replies view.
+
+ORDER = ('-created_at', '-id')
+
+
+def preview_size():
+    return getattr(settings, 'SOCIAL_REPLY_PREVIEW', 3)
+
+
+def attach_latest(posts, n=None):
+    """Set ``post.reply_list`` to each post's latest ``n`` replies, oldest first."""
+    n = preview_size() if n is None else n
+    by_post = {p.pk: [] for p in posts}
+    if by_post and n > 0:
+        latest = (Reply.objects
+                  .filter(post_id__in=by_post)
+                  .annotate(rank=Window(RowNumber(), partition_by=[F('post_id')],
+                                        order_by=[F('created_at').desc(), F('id').desc()]))
+                  .filter(rank__lte=n)
+                  .select_related('author', 'author__profile'))
+        for r in latest:
+            by_post[r.post_id].append(r)
+    for p in posts:
+        p.reply_list = sorted(by_post[p.pk], key=lambda r: (r.created_at, r.pk))
+    return posts
+
+
+def thread_page(post, cursor, size):
+    """(replies oldest first, cursor for the page before) walking back from ``cursor``."""
+    items, earlier = keyset_page(
+        Reply.objects.filter(post=post).select_related('author', 'author__profile'),
+        ORDER, cursor, size,
+    )
+    return items[::-1], earlier
@@ -0,0 +1,102 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Primary / replica routing
+# -----------------------------------------------
+# Writes go to the primary ("default"); reads go to a random alias from
+# SOCIAL_DB_REPLICAS (none configured = everything on the primary). Reads
+# stay on the primary when they can't afford replica lag:
+#
+# * inside a transaction on the primary (it must see its own writes);
+# * once the current request has written anything (db_for_write pins it);
+# * for a short while after a browser's last write, via the sticky cookie
+#   set by social.middleware.ReadYourWritesMiddleware;
+# * in views decorated with @primary_only, and in `with primary():` blocks.
+#
+# The pin is a ContextVar, so it follows a request through threads and
+# asyncio tasks alike; the middleware scopes it to one request. Outside a
+# request (management commands, job workers) the first write pins the rest
+# of the run to the primary.
+
+_pinned = ContextVar('social_db_pinned', default=False)
+_wrote = ContextVar('social_db_wrote', default=False)
+
+
+def replicas():
+    return list(getattr(settings, 'SOCIAL_DB_REPLICAS', []))
+
+
+def sticky_seconds():
+    """How long a browser's reads stay on the primary after it wrote."""
+    return getattr(settings, 'SOCIAL_DB_STICKY_SECONDS', 5)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def wrote():
+    """Whether this context has written to the primary."""
+    return _wrote.get()
+
+
+def pin():
+    """Send the rest of this context's reads to the primary."""
+    _pinned.set(True)
+
+
+def reset():
+    """Start unpinned, as if nothing had been written yet."""
+    _pinned.set(False)
+    _wrote.set(False)
+
+
+@contextmanager
+def primary():
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def primary_only(view):
+    """Decorator: the view reads from the primary only."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with primary():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with primary():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        pool = replicas()
+        if not pool or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(pool)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copies of the primary, never migrated directly
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,318 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .models import CodeSnippet, Post, Reply
+from .pagination import encode_cursor
+
+# Full-text search
+# -----------------------------------------------
+# Posts, replies and code snippets are indexed as "documents" with a title,
+# a body and an optional language. Views only talk to a SearchBackend, picked
+# with SOCIAL_SEARCH_BACKEND, so SQLite FTS5 can later be swapped for a
+# Postgres tsvector/GIN backend without touching callers.
+#
+# The SQLite backend keeps one FTS5 table (created in migration 0015). Its
+# rowid packs the document: pk * 4 + kind code, so an update or delete is a
+# rowid lookup rather than a scan. Rows are kept current by signals
+# (social/signals.py, through indexer(): a no-op when the backend can't run
+# on this database); `manage.py rebuild_search_index` repopulates it.
+#
+# Code gets a second, trigram-tokenized table (migration 0016) keyed by
+# snippet pk. Word tokenizers break `get_object_or_404` or `std::vector` into
+# pieces; trigrams match any substring of 3+ characters instead. A second
+# column holds each identifier split into lowercase words, so `getObjectOr404`
+# also finds `get_object_or_404` and vice versa.
+
+KINDS = {'post': 1, 'reply': 2, 'snippet': 3}
+MODELS = {Post: 'post', Reply: 'reply', CodeSnippet: 'snippet'}
+# saving with update_fields outside these leaves the index alone
+INDEXED_FIELDS = {
+    Post: {'body'},
+    Reply: {'body'},
+    CodeSnippet: {'title', 'code', 'language'},
+}
+
+# value, label for the search form's type filter; 'code' is the trigram search
+TYPE_CHOICES = [
+    ('post', 'Posts'),
+    ('reply', 'Replies'),
+    ('snippet', 'Snippets'),
+    ('code', 'Code (identifiers & substrings)'),
+]
+
+TERM_RE = re.compile(r'\w+\*?')
+MARK_START, MARK_END = '\x02', '\x03'
+IDENT_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+IDENT_PART_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+TRIGRAM = 3  # shortest substring the trigram index can answer
+
+
+def document(obj):
+    """(kind, title, body, language) for an indexed model instance."""
+    kind = MODELS[type(obj)]
+    if kind == 'snippet':
+        return kind, obj.title, obj.code, obj.language
+    return kind, '', obj.body, ''
+
+
+def match_query(text):
+    """Turn user input into a safe FTS MATCH expression, or '' for nothing.
+
+    Every word is quoted (so FTS operators in the input are just text) and
+    the terms are ANDed. A trailing ``*`` asks for a prefix match; the last
+    word is always a prefix so results show up while typing.
+    """
+    terms = TERM_RE.findall(text or '')
+    parts = []
+    for i, term in enumerate(terms):
+        word = term.rstrip('*')
+        prefix = term.endswith('*') or i == len(terms) - 1
+        parts.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(parts)
+
+
+def split_identifier(name):
+    """``getHTTPResponse2`` / ``get_http_response_2`` -> ['get', 'http', 'response', '2']."""
+    return [part.lower() for part in IDENT_PART_RE.findall(name)]
+
+
+def identifier_text(code):
+    """One line per distinct identifier in ``code``, split into words."""
+    lines = (' '.join(split_identifier(name)) for name in IDENT_RE.findall(code or ''))
+    return '\n'.join(dict.fromkeys(line for line in lines if line))
+
+
+def fts_string(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def code_query(text):
+    """MATCH expression for the trigram table, or '' if no term is long enough.
+
+    Each whitespace-separated term must appear in the code as a substring
+    (case-insensitive) or, for identifiers, as the same word sequence in any
+    naming style. Terms shorter than the trigram size are dropped.
+    """
+    clauses = []
+    for term in (text or '').split():
+        if len(term) < TRIGRAM:
+            continue
+        clause = f'code : {fts_string(term)}'
+        words = split_identifier(term) if IDENT_RE.fullmatch(term) else []
+        if len(words) > 1:
+            clause = f'({clause} OR idents : {fts_string(" ".join(words))})'
+        clauses.append(clause)
+    return ' AND '.join(clauses)
+
+
+def code_excerpt(code, query, context=1):
+    """The lines around the first query term found in ``code``, marked up."""
+    lines = (code or '').splitlines()
+    terms = [t for t in (query or '').split() if len(t) >= TRIGRAM]
+    for i, line in enumerate(lines):
+        found = next((t for t in terms if t.lower() in line.lower()), None)
+        if found:
+            break
+    else:
+        i, found = 0, None
+    chunk = '\n'.join(lines[max(0, i - context):i + context + 1])
+    if found:
+        chunk = re.sub(re.escape(found), lambda m: MARK_START + m.group(0) + MARK_END,
+                       chunk, flags=re.IGNORECASE)
+    return excerpt(chunk)
+
+
+def excerpt(raw):
+    """HTML-escape an FTS snippet, then turn its match markers into <mark>."""
+    html = escape(raw or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+class Hit:
+    def __init__(self, kind, pk, score, excerpt):
+        self.kind, self.pk, self.score, self.excerpt = kind, pk, score, excerpt
+        self.obj = None
+
+
+class SearchBackend:
+    """Interface for search backends."""
+
+    def index(self, obj):
+        raise NotImplementedError
+
+    def remove(self, obj):
+        raise NotImplementedError
+
+    def search(self, query, kinds=None, language=None, cursor=None, size=20):
+        """Return (hits, next_cursor), best match first.
+
+        ``cursor`` is the (score, rowid)-style tuple decoded from a previous
+        page's next_cursor; hits come back with ``hit.obj`` loaded.
+        """
+        raise NotImplementedError
+
+    def code_search(self, query, language=None, cursor=None, size=20):
+        """Identifier/substring search over snippet code; same contract as search()."""
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def hydrate(self, hits):
+        """Attach model instances to hits, dropping any whose row is gone."""
+        loaders = {
+            'post': Post.objects.select_related('author', 'author__profile'),
+            'reply': Reply.objects.select_related('author', 'author__profile', 'post__author'),
+            'snippet': CodeSnippet.objects.select_related('author', 'author__profile'),
+        }
+        objs = {}
+        for kind, qs in loaders.items():
+            pks = [h.pk for h in hits if h.kind == kind]
+            if pks:
+                objs[kind] = qs.in_bulk(pks)
+        for h in hits:
+            h.obj = objs.get(h.kind, {}).get(h.pk)
+        return [h for h in hits if h.obj is not None]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    table = 'social_search'
+    code_table = 'social_code_search'
+    # bm25 column weights: a hit in a snippet title counts 4x one in a body
+    rank = 'bm25(4.0, 1.0)'
+
+    def __init__(self):
+        if connection.vendor != 'sqlite':
+            raise ImproperlyConfigured("SQLiteSearchBackend needs the sqlite database backend.")
+
+    @staticmethod
+    def rowid(kind, pk):
+        return pk * 4 + KINDS[kind]
+
+    def index(self, obj):
+        kind, title, body, language = document(obj)
+        with connection.cursor() as cur:
+            # FTS5 has no upsert; delete + insert of the same rowid is cheap
+            cur.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [self.rowid(kind, obj.pk)])
+            cur.execute(
+                f'INSERT INTO {self.table} (rowid, title, body, kind, language) VALUES (%s, %s, %s, %s, %s)',
+                [self.rowid(kind, obj.pk), title, body, kind, language],
+            )
+            if kind == 'snippet':
+                cur.execute(f'DELETE FROM {self.code_table} WHERE rowid = %s', [obj.pk])
+                cur.execute(
+                    f'INSERT INTO {self.code_table} (rowid, code, idents, language) VALUES (%s, %s, %s, %s)',
+                    [obj.pk, obj.code, identifier_text(obj.code), obj.language],
+                )
+
+    def remove(self, obj):
+        kind = MODELS[type(obj)]
+        with connection.cursor() as cur:
+            cur.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [self.rowid(kind, obj.pk)])
+            if kind == 'snippet':
+                cur.execute(f'DELETE FROM {self.code_table} WHERE rowid = %s', [obj.pk])
+
+    def search(self, query, kinds=None, language=None, cursor=None, size=20):
+        expr = match_query(query)
+        if not expr:
+            return [], None
+        where, params = [f'{self.table} MATCH %s', f"rank MATCH '{self.rank}'"], [expr]
+        if kinds:
+            where.append(f"kind IN ({', '.join(['%s'] * len(kinds))})")
+            params += list(kinds)
+        if language:
+            where.append('language = %s')
+            params.append(language)
+        if cursor:
+            # keyset on (rank, rowid): lower bm25 is better
+            where.append('(rank > %s OR (rank = %s AND rowid > %s))')
+            params += [cursor[0], cursor[0], cursor[1]]
+
+        sql = (f"SELECT rowid, kind, rank, snippet({self.table}, -1, char(2), char(3), '…', 16) "
+               f"FROM {self.table} WHERE {' AND '.join(where)} ORDER BY rank, rowid LIMIT %s")
+        with connection.cursor() as cur:
+            cur.execute(sql, params + [size + 1])
+            rows = cur.fetchall()
+
+        next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+        hits = [Hit(kind, rowid // 4, score, excerpt(raw)) for rowid, kind, score, raw in rows]
+        return self.hydrate(hits), next_cursor
+
+    def code_search(self, query, language=None, cursor=None, size=20):
+        expr = code_query(query)
+        if not expr:
+            return [], None
+        where, params = [f'{self.code_table} MATCH %s'], [expr]
+        if language:
+            where.append('language = %s')
+            params.append(language)
+        if cursor:
+            where.append('(rank > %s OR (rank = %s AND rowid > %s))')
+            params += [cursor[0], cursor[0], cursor[1]]
+
+        sql = (f"SELECT rowid, rank FROM {self.code_table} "
+               f"WHERE {' AND '.join(where)} ORDER BY rank, rowid LIMIT %s")
+        with connection.cursor() as cur:
+            cur.execute(sql, params + [size + 1])
+            rows = cur.fetchall()
+
+        next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        hits = self.hydrate([Hit('snippet', pk, score, '') for pk, score in rows])
+        for h in hits:
+            # trigram snippet() marks partial tokens; excerpt from the code instead
+            h.excerpt = code_excerpt(h.obj.code, query)
+        return hits, next_cursor
+
+    def rebuild(self):
+        with connection.cursor() as cur:
+            cur.execute(f'DELETE FROM {self.table}')
+            cur.execute(f'DELETE FROM {self.code_table}')
+        count = 0
+        for model in MODELS:
+            for obj in model.objects.order_by('pk').iterator(chunk_size=1000):
+                self.index(obj)
+                count += 1
+        return count
+
+
+def backend():
+    path = getattr(settings, 'SOCIAL_SEARCH_BACKEND', 'social.search.SQLiteSearchBackend')
+    try:
+        return import_string(path)()
+    except ImportError as exc:
+        raise ImproperlyConfigured(f"Cannot load search backend {path!r}: {exc}") from exc
+
+
+class NullIndex:
+    """Stands in for a backend that can't run here: writes go through unindexed."""
+
+    def index(self, obj):
+        pass
+
+    def remove(self, obj):
+        pass
+
+
+def indexer():
+    """The backend, for keeping the index current from the write path.
+
+    A backend that can't run on this database (SQLiteSearchBackend on
+    Postgres, say) must not make every save fail; only running a search
+    reports it.
+    """
+    try:
+        return backend()
+    except ImproperlyConfigured:
+        return NullIndex()
@@ -1,14 +1,175 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Profile
+from .models import CodeSnippet, Follow, Profile, Post, Reply
+from . import follows, fragments, jobs, live, members, ranking, search
+from .counters import post_counters
+from .utils import ensure_highlighted, ensure_rendered, highlight_key, markdown_key
 
 # Create or update user profile on user creation
 # -----------------------------------------------
 @receiver(post_save, sender=User)
 def make_profile(sender, instance, created, **kwargs):
+    # Only on creation: re-saving the whole profile on every user save (e.g.
+    # each login) would write back stale follower/following counters.
     if created:
         Profile.objects.create(user = instance)
-    instance.profile.save()
-    
-    
+        follows.forget(instance.pk)  # in case a rolled-back user had this pk
+
+
+# Render Markdown once at write time so read paths never call the engine.
+# Unchanged bodies keep their stored HTML (same content hash). When jobs are
+# queued, a changed body is shown as plain text until the job renders it.
+# -----------------------------------------------
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Reply)
+def render_body(sender, instance, **kwargs):
+    if jobs.eager():
+        ensure_rendered(instance)
+    elif instance.rendered_key != markdown_key(instance.body):
+        instance.rendered_html = ''
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Reply)
+def queue_render(sender, instance, **kwargs):
+    key = markdown_key(instance.body)
+    if instance.rendered_key != key:
+        jobs.enqueue('markdown.render', key=f'markdown:{sender._meta.label_lower}:{instance.pk}:{key}',
+                     rerun=True, model=sender._meta.label_lower, pk=instance.pk)
+
+
+# New posts enter Explore with their starting score; social.ranking's
+# periodic job takes over once they get engagement.
+# -----------------------------------------------
+@receiver(pre_save, sender=Post)
+def initial_score(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.score = ranking.score_post(instance)
+
+
+# Same for code snippets: Pygments runs once per distinct (code, language).
+# -----------------------------------------------
+@receiver(pre_save, sender=CodeSnippet)
+def highlight_snippet(sender, instance, **kwargs):
+    if jobs.eager():
+        ensure_highlighted(instance)
+    elif instance.highlighted_key != highlight_key(instance.code, instance.language):
+        instance.highlighted_html = ''
+
+
+@receiver(post_save, sender=CodeSnippet)
+def queue_highlight(sender, instance, **kwargs):
+    key = highlight_key(instance.code, instance.language)
+    if instance.highlighted_key != key:
+        jobs.enqueue('snippets.highlight', key=f'highlight:{instance.pk}:{key}', rerun=True, pk=instance.pk)
+
+
+# Post.reply_count follows replies through the write-behind counter buffer.
+# -----------------------------------------------
+@receiver(post_save, sender=Reply)
+def count_reply(sender, instance, created, **kwargs):
+    if created:
+        post_counters.add(instance.post_id, reply_count=1)
+
+
+@receiver(post_delete, sender=Reply)
+def uncount_reply(sender, instance, **kwargs):
+    post_counters.add(instance.post_id, reply_count=-1)
+
+
+# Keep follow counters (and cached follow lists) right when an account and
+# its edges are deleted.
+# -----------------------------------------------
+@receiver(pre_delete, sender=User)
+def release_follow_counts(sender, instance, **kwargs):
+    followed = Follow.objects.filter(follower=instance).values('following_id')
+    fans = Follow.objects.filter(following=instance).values('follower_id')
+    Profile.objects.filter(user__in=followed).update(follower_count=F('follower_count') - 1)
+    Profile.objects.filter(user__in=fans).update(following_count=F('following_count') - 1)
+    follows.forget(instance.pk, *followed.values_list('following_id', flat=True),
+                   *fans.values_list('follower_id', flat=True))
+
+
+# Derive responsive WebP variants whenever an upload changes.
+# -----------------------------------------------
+def queue_variants(instance, field, variants_field, kind):
+    name = getattr(instance, field).name or ''
+    if (getattr(instance, variants_field) or {}).get('source', '') == name:
+        return
+    label = instance._meta.label_lower
+    jobs.enqueue('images.refresh', key=f'images:{label}:{instance.pk}:{name}',
+                 model=label, pk=instance.pk, field=field, variants_field=variants_field, kind=kind)
+
+
+@receiver(post_save, sender=Post)
+def post_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'image' in update_fields:
+        queue_variants(instance, 'image', 'image_variants', 'post')
+
+
+@receiver(post_save, sender=Profile)
+def avatar_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'avatar' in update_fields:
+        queue_variants(instance, 'avatar', 'avatar_variants', 'avatar')
+
+
+# Keep the full-text search index in step with posts, replies and snippets.
+# -----------------------------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Reply)
+@receiver(post_save, sender=CodeSnippet)
+def index_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or search.INDEXED_FIELDS[sender] & set(update_fields):
+        search.indexer().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Reply)
+@receiver(post_delete, sender=CodeSnippet)
+def unindex_for_search(sender, instance, **kwargs):
+    search.indexer().remove(instance)
+
+
+# Retire cached post cards when what they show changes. Counters, reactions
+# and follows are part of the card's cache key instead (social.fragments).
+# -----------------------------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_card(sender, instance, **kwargs):
+    fragments.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Reply)
+@receiver(post_delete, sender=Reply)
+def invalidate_reply_card(sender, instance, **kwargs):
+    fragments.invalidate(instance.post_id)
+
+
+# Keep the in-memory username index (social.members) in step with signups,
+# renames and account deletions made by this process.
+# -----------------------------------------------
+@receiver(post_save, sender=User)
+def index_member(sender, instance, **kwargs):
+    members.index.add(instance.pk, instance.username)
+
+
+@receiver(post_delete, sender=User)
+def unindex_member(sender, instance, **kwargs):
+    members.index.remove(instance.pk)
+    members.member_cache.clear()  # suggestions may link to them
+
+
+# Tell open feeds about new posts and replies (social.live).
+# -----------------------------------------------
+@receiver(post_save, sender=Post)
+def announce_post(sender, instance, created, **kwargs):
+    if created:
+        live.new_post(instance)
+
+
+@receiver(post_save, sender=Reply)
+def announce_reply(sender, instance, created, **kwargs):
+    if created:
+        live.new_reply(instance)
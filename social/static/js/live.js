@@ -0,0 +1,109 @@
+// Live feed
+// -----------------------------------------------
+// 1. Forms marked data-live="post|react|reply|follow" are sent with fetch()
+//    asking for JSON, and the answer patches the page in place instead of a
+//    redirect and a whole feed render. Anything unexpected falls back to a
+//    normal form submit.
+// 2. [data-live-stream] opens an EventSource on the live stream (social.live):
+//    new posts from people you follow, counter changes and replies arrive
+//    as they happen. Under WSGI the stream answers 204 and stays closed.
+(function () {
+  const feed = document.querySelector('[data-live-stream]');
+
+  function cardFor(postId) {
+    return document.querySelector(`[data-post="${postId}"]`);
+  }
+
+  function setCounts(card, data) {
+    if (!card) return;
+    card.querySelectorAll('[data-count]').forEach(el => {
+      if (data[el.dataset.count] !== undefined) el.textContent = data[el.dataset.count];
+    });
+  }
+
+  function setReaction(card, mine) {
+    if (!card) return;
+    card.querySelector('.btn-like')?.classList.toggle('is-active', mine === 'like');
+    card.querySelector('.btn-dislike')?.classList.toggle('is-active', mine === 'dislike');
+  }
+
+  function addReply(card, data) {
+    if (!card || card.querySelector(`[data-reply="${data.reply}"]`)) return;
+    const list = card.querySelector('details.replies ul');
+    list.querySelector('[data-no-replies]')?.remove();
+    list.insertAdjacentHTML('beforeend', data.html);
+    setCounts(card, data);
+  }
+
+  function setFollowing(username, following) {
+    // every follow button for that member on the page, not just the one clicked
+    document.querySelectorAll('form[data-live="follow"]').forEach(form => {
+      const m = form.action.match(/\/u\/([^/]+)\/(un)?follow\/$/);
+      if (!m || decodeURIComponent(m[1]) !== username) return;
+      form.action = form.action.replace(/\/(un)?follow\/$/, following ? '/unfollow/' : '/follow/');
+      const btn = form.querySelector('button');
+      btn.textContent = following ? 'Unfollow' : 'Follow';
+      if (btn.classList.contains('btn-follow') || btn.classList.contains('btn-unfollow')) {
+        btn.className = following ? 'btn-unfollow' : 'btn-follow';
+      }
+    });
+  }
+
+  async function addCard(postId) {
+    if (!feed || !feed.hasAttribute('data-live-prepend') || cardFor(postId)) return;
+    const resp = await fetch(feed.dataset.liveCard.replace('/0/', `/${postId}/`));
+    if (!resp.ok || cardFor(postId)) return;
+    feed.querySelector('[data-no-posts]')?.remove();
+    feed.insertAdjacentHTML('afterbegin', await resp.text());
+    if (window.convertFences) convertFences(feed.firstElementChild);
+  }
+
+  const handlers = {
+    post: async (form, data) => { form.reset(); await addCard(data.post); },
+    react: (form, data) => {
+      const card = form.closest('[data-post]');
+      setCounts(card, data);
+      if ('my_reaction' in data) setReaction(card, data.my_reaction);
+    },
+    reply: (form, data) => { form.reset(); addReply(form.closest('[data-post]'), data); },
+    follow: (form, data) => setFollowing(data.user, data.following),
+  };
+
+  document.addEventListener('submit', async (e) => {
+    const form = e.target.closest('form[data-live]');
+    if (!form || !handlers[form.dataset.live]) return;
+    e.preventDefault();
+    const button = form.querySelector('button[type="submit"]');
+    if (button) button.disabled = true;
+    let data;
+    try {
+      const resp = await fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: {'Accept': 'application/json'},
+        credentials: 'same-origin',
+      });
+      if (!resp.ok) throw new Error(resp.status);
+      data = await resp.json();
+    } catch (err) {
+      form.submit();  // let the server redirect and flash the error
+      return;
+    } finally {
+      if (button) button.disabled = false;
+    }
+    await handlers[form.dataset.live](form, data);
+  });
+
+  if (!feed || !window.EventSource) return;
+  const stream = new EventSource(feed.dataset.liveStream);
+  const on = (type, fn) => stream.addEventListener(type, e => fn(JSON.parse(e.data)));
+  on('post', data => addCard(data.post));
+  on('counts', data => setCounts(cardFor(data.post), data));
+  on('reply', data => addReply(cardFor(data.post), data));
+  on('follow', data => setFollowing(data.username, data.following));
+  on('resync', () => {
+    if (document.querySelector('[data-live-resync]')) return;
+    feed.insertAdjacentHTML('afterbegin',
+      '<p class="muted" data-live-resync>New activity. <a href="">Refresh</a></p>');
+  });
+})();
@@ -0,0 +1,78 @@
+import logging
+
+from django.apps import apps
+
+from . import fragments, images, jobs, ranking, timeline
+from .models import CodeSnippet, Post, Share
+from .reconcile import RECONCILERS
+from .utils import ensure_highlighted, ensure_rendered
+
+logger = logging.getLogger(__name__)
+
+# Job handlers
+# -----------------------------------------------
+# Everything social.jobs can run. Handlers take ids rather than objects
+# (payloads are JSON) and re-read the row, which may have changed or been
+# deleted since the job was queued.
+
+
+def _load(model, pk, *fields):
+    qs = apps.get_model(model).objects.filter(pk=pk)
+    return (qs.only('pk', *fields) if fields else qs).first()
+
+
+@jobs.register('images.refresh')
+def refresh_images(model, pk, field, variants_field, kind):
+    instance = _load(model, pk, field, variants_field)
+    if instance is not None and images.refresh(instance, field, variants_field, kind):
+        if model == 'social.post':
+            fragments.invalidate(pk)
+
+
+@jobs.register('markdown.render')
+def render_markdown(model, pk):
+    instance = _load(model, pk, 'body', 'rendered_html', 'rendered_key')
+    if instance is not None and ensure_rendered(instance):
+        type(instance).objects.filter(pk=pk).update(
+            rendered_html=instance.rendered_html, rendered_key=instance.rendered_key,
+        )
+        # queryset updates skip the signals; retire the card showing this body
+        fragments.invalidate(pk if model == 'social.post' else instance.post_id)
+
+
+@jobs.register('snippets.highlight')
+def highlight_snippet(pk):
+    snippet = _load('social.codesnippet', pk, 'code', 'language', 'highlighted_html', 'highlighted_key')
+    if snippet is not None and ensure_highlighted(snippet):
+        CodeSnippet.objects.filter(pk=pk).update(
+            highlighted_html=snippet.highlighted_html, highlighted_key=snippet.highlighted_key,
+        )
+
+
+@jobs.register('timeline.fan_out_post')
+def fan_out_post(post_id):
+    post = Post.objects.select_related('author__profile').filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out_post(post)
+
+
+@jobs.register('timeline.fan_out_share')
+def fan_out_share(share_id):
+    share = Share.objects.select_related('user__profile', 'post').filter(pk=share_id).first()
+    if share is not None:
+        timeline.fan_out_share(share)
+
+
+@jobs.register('explore.rescore', max_attempts=1)
+def rescore_posts():
+    changed = ranking.rescore()
+    if changed:
+        logger.info("Rescored %d post(s)", changed)
+
+
+@jobs.register('counters.reconcile', max_attempts=1)
+def reconcile_counters(targets=None):
+    for name in targets or RECONCILERS:
+        fixed = RECONCILERS[name]()
+        if fixed:
+            logger.info("Reconciled %d %s row(s)", fixed, name)
@@ -0,0 +1,50 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+# <img> tags built from the WebP variants recorded by social.images.
+# Fall back to the original upload (not processed yet) or the default avatar.
+
+
+def _srcset(variants):
+    widths = (variants or {}).get('widths') or {}
+    pairs = sorted((int(w), default_storage.url(name)) for w, name in widths.items())
+    return pairs, ', '.join(f'{url} {w}w' for w, url in pairs)
+
+
+def _pick(pairs, width):
+    """Smallest variant at least ``width`` wide, else the largest one."""
+    for w, url in pairs:
+        if w >= width:
+            return url
+    return pairs[-1][1]
+
+
+@register.simple_tag
+def avatar_img(user, size=48, css_class=''):
+    profile = getattr(user, 'profile', None)
+    cls = format_html(' class="{}"', css_class) if css_class else ''
+    pairs, srcset = _srcset(getattr(profile, 'avatar_variants', None))
+    if pairs:
+        return format_html(
+            '<img{} src="{}" srcset="{}" sizes="{}px" width="{}" height="{}" alt="{}" loading="lazy">',
+            cls, _pick(pairs, size * 2), srcset, size, size, size, user.username,
+        )
+    src = profile.avatar.url if profile and profile.avatar else static('img/avatar-default.png')
+    return format_html('<img{} src="{}" alt="{}" loading="lazy">', cls, src, user.username)
+
+
+@register.simple_tag
+def post_image(post, sizes='(max-width: 700px) 100vw, 640px'):
+    if not post.image:
+        return ''
+    pairs, srcset = _srcset(post.image_variants)
+    if pairs:
+        return format_html(
+            '<img class="post-image" src="{}" srcset="{}" sizes="{}" alt="post image" loading="lazy">',
+            _pick(pairs, 640), srcset, sizes,
+        )
+    return format_html('<img class="post-image" src="{}" alt="post image" loading="lazy">', post.image.url)
@@ -0,0 +1,45 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from social import fragments
+
+register = template.Library()
+
+# {% postcard post "feed" %} ... {% endpostcard %}
+# Caches the enclosed card markup per post/viewer state (see social.fragments).
+# Inside the block use {{ card_next }} / {{ card_path }} for "next" fields
+# instead of request.get_full_path / request.path.
+
+
+class PostCardNode(template.Node):
+    def __init__(self, post, variant, nodelist):
+        self.post, self.variant, self.nodelist = post, variant, nodelist
+
+    def render(self, context):
+        post = self.post.resolve(context)
+        request = context.get('request')
+        if request is None or not post.pk or not fragments.timeout():
+            with context.push(card_next=request.get_full_path() if request else '',
+                              card_path=request.path if request else ''):
+                return self.nodelist.render(context)
+
+        key = fragments.card_key(post, self.variant.resolve(context), request.user,
+                                 context.get('followed_ids') or ())
+        html = fragments.cards.get(key)
+        if html is None:
+            with context.push(csrf_token=fragments.CSRF_SENTINEL,
+                              card_next=fragments.NEXT_SENTINEL,
+                              card_path=fragments.PATH_SENTINEL):
+                html = self.nodelist.render(context)
+            fragments.cards.set(key, html)
+        return mark_safe(fragments.personalize(html, request, context.get('csrf_token', '')))
+
+
+@register.tag
+def postcard(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a post and a variant name")
+    nodelist = parser.parse(('endpostcard',))
+    parser.delete_first_token()
+    return PostCardNode(parser.compile_filter(bits[1]), parser.compile_filter(bits[2]), nodelist)
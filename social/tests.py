@@ -1,3 +1,1338 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+from datetime import timedelta
+from io import StringIO
+from urllib.parse import parse_qsl
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import QuerySet
+from django.http import Http404, HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import (async_views, bench, caching, follows, fragments, jobs, live, members, ranking, reconcile,
+               routers, search, timeline, views)
+from .counters import CounterBuffer
+from .middleware import ReadYourWritesMiddleware
+from .models import CodeSnippet, Follow, Job, Post, Profile, Reaction, Reply, Share, TimelineEntry
+from .utils import RENDERER_VERSION, ensure_rendered, highlight_key, markdown_key, render_markdown
+
+User = get_user_model()
+
+
+def setUpModule():
+    # background jobs run inline and counters are written through (no flush
+    # thread racing the test database); the classes that test the queue and
+    # the buffer turn them off again
+    suite_settings = override_settings(SOCIAL_JOBS_EAGER=True, SOCIAL_COUNTER_FLUSH_INTERVAL=0)
+    suite_settings.enable()
+    unittest.addModuleCleanup(suite_settings.disable)
+
+
+# Query-count regressions
+# -----------------------------------------------
+# Every watched view must issue the same number of queries whatever the data
+# size; a difference means an N+1 (per-post / per-member query) crept back.
+@override_settings(SOCIAL_FEED_PAGE_SIZE=10)
+class QueryCountRegressionTests(TestCase):
+    SMALL, LARGE = 3, 40
+
+    def counts(self, posts, prefix):
+        data = bench.seed(posts, follows=posts // 2 + 1, replies_per_post=2, prefix=prefix)
+        self.client.force_login(data['viewer'])
+        # both sizes start cold, or the second run would ride on the first's cache
+        cache.clear()
+        members.index.reset()
+        result = {}
+        for name, method, url in bench.scenarios(data):
+            status, queries, _ = bench.measure(self.client, method, url)
+            self.assertLess(status, 400, f"{name} returned {status}")
+            result[name] = queries
+        return result
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.counts(self.SMALL, 'small')
+        large = self.counts(self.LARGE, 'large')
+        for name, queries in small.items():
+            with self.subTest(view=name):
+                self.assertEqual(large[name], queries,
+                                 f"{name}: {queries} queries at {self.SMALL} posts, "
+                                 f"{large[name]} at {self.LARGE}")
+
+
+@override_settings(SOCIAL_FEED_PAGE_SIZE=10)
+class FeedPaginationTests(TestCase):
+    def setUp(self):
+        self.data = bench.seed(25, follows=3, replies_per_post=0)
+        self.client.force_login(self.data['viewer'])
+
+    def test_feed_pages_are_bounded_and_cover_everything(self):
+        seen, url = [], reverse('social:feed')
+        while url:
+            response = self.client.get(url)
+            posts = response.context['posts']
+            self.assertLessEqual(len(posts), 10)
+            seen += [p.pk for p in posts]
+            cursor = response.context['next_cursor']
+            url = f"{reverse('social:feed')}?cursor={cursor}" if cursor else None
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    @override_settings(SOCIAL_PROFILE_PAGE_SIZE=2)
+    def test_profile_pages_are_bounded_and_cover_everything(self):
+        author = self.data['post'].author
+        total = Post.objects.filter(author=author).count()
+        base = reverse('social:profile', args=[author.username])
+        seen, url = [], base
+        while url:
+            response = self.client.get(url)
+            posts = response.context['posts']
+            self.assertLessEqual(len(posts), 2)
+            seen += [p.pk for p in posts]
+            cursor = response.context['next_cursor']
+            url = f"{base}?cursor={cursor}" if cursor else None
+        self.assertEqual(len(set(seen)), total)
+        self.assertGreater(total, 2)
+
+    def test_bogus_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('social:feed'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_first_page'])
+
+
+@override_settings(SOCIAL_TIMELINE_FANOUT_LIMIT=2)
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('tl_author')
+        self.reader = User.objects.create_user('tl_reader')
+        self.other = User.objects.create_user('tl_other')
+        follows.follow(self.reader, self.author)
+
+    def timeline_of(self, user):
+        return set(TimelineEntry.objects.filter(user=user).values_list('post_id', flat=True))
+
+    def post(self, author, body='post'):
+        # reloaded so author.profile has the current follower count
+        return Post.objects.select_related('author__profile').get(
+            pk=Post.objects.create(author=author, body=body).pk)
+
+    def test_fan_out_reaches_author_and_followers_once(self):
+        post = self.post(self.author)
+        timeline.fan_out_post(post)
+        timeline.fan_out_post(post)  # a retried job adds nothing
+        self.assertEqual(self.timeline_of(self.author), {post.pk})
+        self.assertEqual(self.timeline_of(self.reader), {post.pk})
+        self.assertEqual(self.timeline_of(self.other), set())
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        mine = self.post(self.author)
+        theirs = [self.post(self.other, f'other {i}') for i in range(3)]
+        Share.objects.create(post=mine, user=self.other)
+        self.client.force_login(self.reader)
+
+        self.client.post(reverse('social:follow', args=['tl_other']))
+        self.assertEqual(self.timeline_of(self.reader), {p.pk for p in theirs} | {mine.pk})
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=mine, shared_by=self.other).exists())
+
+        self.client.post(reverse('social:unfollow', args=['tl_other']))
+        # mine was only there as a reshare, but the reader follows its author
+        self.assertEqual(self.timeline_of(self.reader), {mine.pk})
+        self.assertFalse(TimelineEntry.objects.filter(shared_by__isnull=False).exists())
+
+    def test_trim_keeps_other_authors(self):
+        kept, dropped = self.post(self.author), self.post(self.other)
+        timeline.fan_out_post(kept)
+        timeline.backfill(self.reader, self.other)
+        timeline.trim(self.reader, self.other)
+        self.assertEqual(self.timeline_of(self.reader), {kept.pk})
+        self.assertNotIn(dropped.pk, self.timeline_of(self.reader))
+
+    def test_unfollowing_a_resharer_keeps_posts_of_followed_authors(self):
+        post = self.post(self.other)
+        follows.follow(self.reader, self.author)
+        timeline.fan_out_share(Share.objects.create(post=post, user=self.author))
+        follows.follow(self.reader, self.other)
+        timeline.backfill(self.reader, self.other)  # ignored: the reshare holds the row
+        timeline.trim(self.reader, self.author)
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual((entry.shared_by_id, entry.created_at), (None, post.created_at))
+
+    def test_rebuild_follows_the_graph(self):
+        own, followed, stray = self.post(self.reader), self.post(self.author), self.post(self.other)
+        TimelineEntry.objects.all().delete()
+        TimelineEntry.objects.create(user=self.reader, post=stray, author=self.other,
+                                     created_at=stray.created_at)
+        call_command('rebuild_timelines', 'tl_reader', stdout=StringIO())
+        self.assertEqual(self.timeline_of(self.reader), {own.pk, followed.pk})
+
+    def test_rebuild_keeps_a_popular_authors_own_posts(self):
+        for name in ('tl_fan1', 'tl_fan2'):
+            follows.follow(User.objects.create_user(name), self.author)
+        post = self.post(self.author)
+        timeline.fan_out_post(post)
+        self.assertTrue(Profile.objects.get(user=self.author).fanout_on_read)
+        timeline.rebuild(self.author)
+        self.assertEqual(self.timeline_of(self.author), {post.pk})
+        posts, _ = timeline.timeline_page(self.author, None, 10)
+        self.assertEqual([p.pk for p in posts], [post.pk])
+
+    def test_popular_authors_are_merged_at_read_time(self):
+        for name in ('tl_fan1', 'tl_fan2'):
+            follows.follow(User.objects.create_user(name), self.author)
+        post = self.post(self.author)
+        timeline.fan_out_post(post)
+
+        self.author.profile.refresh_from_db()
+        self.assertTrue(self.author.profile.fanout_on_read)
+        self.assertEqual(self.timeline_of(self.reader), set())  # not pushed...
+        posts, _ = timeline.timeline_page(self.reader, None, 10)
+        self.assertEqual([p.pk for p in posts], [post.pk])  # ...but merged in
+
+        # sticky: dropping back under the limit doesn't push again
+        follows.unfollow(User.objects.get(username='tl_fan1'), self.author)
+        timeline.fan_out_post(self.post(self.author, 'later'))
+        self.assertEqual(self.timeline_of(self.reader), set())
+
+
+class MarkdownRenderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('writer')
+        self.post = Post.objects.create(author=self.user, body='**bold**')
+
+    def test_rendered_at_write_time_and_again_on_edit(self):
+        self.assertIn('<strong>bold</strong>', self.post.rendered_html)
+        self.assertEqual(self.post.rendered_key, markdown_key('**bold**'))
+        self.assertFalse(ensure_rendered(self.post))  # unchanged body: nothing to do
+
+        self.post.body = '*edited*'
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertIn('<em>edited</em>', self.post.rendered_html)
+        self.assertEqual(self.post.rendered_key, markdown_key('*edited*'))
+
+    def test_raw_html_in_a_reply_is_escaped(self):
+        reply = Reply.objects.create(post=self.post, author=self.user,
+                                     body='<script>alert(1)</script> <img src=x onerror=alert(1)> [x](javascript:alert(1))')
+        self.assertNotIn('<script', reply.rendered_html)
+        self.assertNotIn('<img', reply.rendered_html)
+        self.assertNotIn('javascript:', reply.rendered_html)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('social:post-replies', args=[self.post.pk]))
+        self.assertNotContains(response, '<script>alert(1)')
+        self.assertContains(response, '&lt;script&gt;alert(1)&lt;/script&gt;')
+
+    def test_entity_encoded_schemes_are_dropped(self):
+        for url in ('&#106;avascript:alert(1)', '&#x6a;avascript:alert(1)', 'javascript&colon;alert(1)',
+                    'java&#9;script:alert(1)'):
+            with self.subTest(url=url):
+                html = render_markdown(f'[x]({url}) ![i]({url})')
+                self.assertNotIn('href', html)
+                self.assertNotIn('src', html)
+        self.assertIn('href="https://example.com/?a=1&amp;b=2"',
+                      render_markdown('[x](https://example.com/?a=1&b=2)'))
+
+    def test_rerender_command_fixes_stale_rows_only(self):
+        fresh = Post.objects.create(author=self.user, body='fresh')
+        Post.objects.filter(pk=self.post.pk).update(rendered_html='<p>old</p>', rendered_key='stale')
+        out = StringIO()
+        call_command('rerender_markdown', stdout=out)
+        self.assertIn('Post: re-rendered 1 row(s)', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', self.post.rendered_html)
+
+        # a new renderer version makes every stored body stale
+        with unittest.mock.patch('social.utils.RENDERER_VERSION', RENDERER_VERSION + 1):
+            call_command('rerender_markdown', stdout=out)
+            fresh.refresh_from_db()
+            self.assertEqual(fresh.rendered_key, markdown_key('fresh'))
+        self.assertIn('Post: re-rendered 2 row(s)', out.getvalue())
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.client.force_login(self.alice)
+
+    def counts(self, user):
+        profile = Profile.objects.get(user=user)
+        return profile.follower_count, profile.following_count
+
+    def test_follow_is_idempotent_and_keeps_counters_in_sync(self):
+        url = reverse('social:follow', args=['bob'])
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(Follow.objects.filter(follower=self.alice, following=self.bob).count(), 1)
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+        self.client.post(reverse('social:unfollow', args=['bob']))
+        self.client.post(reverse('social:unfollow', args=['bob']))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    def test_deleting_an_account_releases_its_counts(self):
+        follows.follow(self.alice, self.bob)
+        follows.follow(self.bob, self.alice)
+        self.bob.delete()
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    def test_reconcile_counters_fixes_drift(self):
+        follows.follow(self.alice, self.bob)
+        Profile.objects.filter(user=self.bob).update(follower_count=42)
+        Profile.objects.filter(user=self.alice).update(following_count=0)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('would fix 2', out.getvalue())
+        self.assertEqual(self.counts(self.bob), (42, 0))
+
+        call_command('reconcile_counters', 'profiles', '--batch-size', '1', stdout=out)
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+    def test_profile_edit_does_not_overwrite_counters(self):
+        stale = self.alice.profile
+        follows.follow(self.bob, self.alice)
+        self.client.post(reverse('social:profile', args=['alice']), {'bio': 'hi'})
+        self.assertEqual(stale.follower_count, 0)
+        self.assertEqual(self.counts(self.alice), (1, 0))
+
+    @override_settings(SOCIAL_FOLLOW_PAGE_SIZE=2, SOCIAL_FOLLOW_PREVIEW=1)
+    def test_follower_lists_are_paginated(self):
+        fans = [User.objects.create_user(f'fan{i}') for i in range(5)]
+        for fan in fans:
+            follows.follow(fan, self.bob)
+
+        response = self.client.get(reverse('social:profile', args=['bob']))
+        self.assertEqual(response.context['followers'], [fans[-1]])
+        self.assertEqual(response.context['follower_count'], 5)
+
+        seen, url = [], reverse('social:followers', args=['bob'])
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.context['people']), 2)
+            seen += response.context['people']
+            cursor = response.context['next_cursor']
+            url = f"{reverse('social:followers', args=['bob'])}?cursor={cursor}" if cursor else None
+        self.assertEqual(seen, fans[::-1])
+
+
+class ReactionTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.post = Post.objects.create(author=self.alice, body='hello')
+        self.client.force_login(self.alice)
+
+    def react(self, kind):
+        self.client.post(reverse('social:post-react', args=[self.post.pk, kind]))
+        self.post.refresh_from_db()
+        return self.post.likes_count, self.post.dislikes_count
+
+    def test_like_toggles_and_switches(self):
+        self.assertEqual(self.react('like'), (1, 0))
+        self.assertEqual(self.react('like'), (0, 0))
+        self.assertEqual(self.react('like'), (1, 0))
+        self.assertEqual(self.react('dislike'), (0, 1))
+        self.assertEqual(Reaction.objects.get(post=self.post, user=self.alice).kind, 'dislike')
+
+    def test_unknown_action_is_404(self):
+        response = self.client.post(reverse('social:post-react', args=[self.post.pk, 'love']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_share_and_reply_routes_are_not_swallowed_by_reactions(self):
+        self.client.post(reverse('social:post-share', args=[self.post.pk]))
+        self.client.post(reverse('social:post-reply', args=[self.post.pk]), {'body': 'hi'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.shares_count, 1)
+        self.assertEqual(self.post.replies.count(), 1)
+
+    def test_feed_marks_the_viewers_reactions(self):
+        timeline.fan_out_post(self.post)
+        self.react('like')
+        response = self.client.get(reverse('social:feed'))
+        self.assertEqual(response.context['posts'][0].my_reaction, 'like')
+
+
+# A long interval keeps the background thread asleep; tests flush by hand.
+@override_settings(SOCIAL_COUNTER_FLUSH_INTERVAL=60)
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user('alice')
+        self.posts = [Post.objects.create(author=author, body=str(i)) for i in range(3)]
+        self.buffer = CounterBuffer(Post)
+        self.buffer._ensure_thread = lambda: None  # no flush thread: the tests flush explicitly
+
+    def test_increments_are_batched_until_flush(self):
+        for p in self.posts:
+            self.buffer.add(p.pk, likes_count=1)
+        self.buffer.add(self.posts[0].pk, likes_count=1, shares_count=1)
+
+        self.posts[1].refresh_from_db()
+        self.assertEqual(self.posts[1].likes_count, 0)
+        self.assertEqual(self.buffer.overlay([self.posts[1]])[0].likes_count, 1)
+
+        # two distinct delta shapes -> two UPDATEs (+ savepoint bookkeeping)
+        with self.assertNumQueries(8):
+            self.assertEqual(self.buffer.flush(), 3)
+        counts = dict(Post.objects.values_list('pk', 'likes_count'))
+        self.assertEqual(counts, {self.posts[0].pk: 2, self.posts[1].pk: 1, self.posts[2].pk: 1})
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_opposite_increments_cancel_out(self):
+        pk = self.posts[0].pk
+        self.buffer.add(pk, likes_count=1)
+        self.buffer.add(pk, likes_count=-1)
+        with self.assertNumQueries(0):
+            self.buffer.flush()
+
+    def test_decrements_stop_at_zero(self):
+        self.buffer.add(self.posts[0].pk, likes_count=-1)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].likes_count, 0)
+
+    def test_a_failing_group_does_not_hold_back_the_rest(self):
+        real_update = QuerySet.update
+
+        def update(qs, **kwargs):
+            if 'shares_count' in kwargs:
+                raise IntegrityError('CHECK constraint failed')
+            return real_update(qs, **kwargs)
+
+        self.buffer.add(self.posts[0].pk, likes_count=1)
+        self.buffer.add(self.posts[1].pk, shares_count=1)
+        with unittest.mock.patch.object(QuerySet, 'update', update), self.assertLogs('social.counters', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.flush(), 0)  # dropped, not re-queued
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).likes_count, 1)
+
+    def test_reconcile_waits_out_other_workers_buffers(self):
+        post, fan = self.posts[0], User.objects.create_user('fan')
+        Reaction.objects.create(post=post, user=fan, kind=Reaction.LIKE)
+        other_worker = CounterBuffer(Post)  # holds that like's +1, not flushed yet
+        other_worker._pending[post.pk].update(likes_count=1)
+        with unittest.mock.patch('social.reconcile.time.sleep', lambda s: other_worker.flush()):
+            with override_settings(SOCIAL_COUNTER_FLUSH_INTERVAL=1):
+                self.assertEqual(reconcile.reconcile_posts(), 0)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+
+
+class ReshareTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.sharer = User.objects.create_user('sharer')
+        self.reader = User.objects.create_user('reader')
+        follows.follow(self.reader, self.sharer)
+        self.post = Post.objects.create(author=self.author, body='original')
+        timeline.fan_out_post(self.post)
+
+    def feed_for(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('social:feed')).context['posts']
+
+    def share(self):
+        self.client.force_login(self.sharer)
+        self.client.post(reverse('social:post-share', args=[self.post.pk]))
+
+    def test_shares_are_deduplicated_and_counted(self):
+        self.share()
+        self.share()
+        self.post.refresh_from_db()
+        self.assertEqual(Share.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(self.post.shares_count, 1)
+
+    def test_reshare_reaches_followers_of_the_sharer(self):
+        self.assertEqual(self.feed_for(self.reader), [])
+        self.share()
+        posts = self.feed_for(self.reader)
+        self.assertEqual(posts, [self.post])
+        self.assertEqual(posts[0].shared_by, self.sharer)
+
+        self.client.post(reverse('social:unfollow', args=['sharer']))
+        self.assertEqual(self.feed_for(self.reader), [])
+
+    def test_reshares_interleave_with_posts_in_one_scan(self):
+        self.share()
+        newer = Post.objects.create(author=self.sharer, body='newer')
+        timeline.fan_out_post(newer)
+        with CaptureQueriesContext(connection) as ctx:
+            posts = self.feed_for(self.reader)
+        self.assertEqual(posts, [newer, self.post])
+        scans = [q for q in ctx.captured_queries if 'FROM "social_timelineentry"' in q['sql']]
+        self.assertEqual(len(scans), 1)
+
+    @override_settings(SOCIAL_TIMELINE_FANOUT_LIMIT=0)
+    def test_reshares_by_high_follower_accounts_are_merged_at_read_time(self):
+        Profile.objects.filter(user=self.sharer).update(fanout_on_read=True)
+        self.share()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+        posts = self.feed_for(self.reader)
+        self.assertEqual(posts, [self.post])
+        self.assertEqual(posts[0].shared_by, self.sharer)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, SOCIAL_IMAGE_WIDTHS={'post': (100, 400), 'avatar': (48,)})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('uploader')
+
+    def jpeg(self, width, height):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90 CW
+        exif[0x010F] = 'TestCam'
+        buf = io.BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buf, 'JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buf.getvalue(), content_type='image/jpeg')
+
+    def test_variants_are_webp_without_exif_and_never_upscaled(self):
+        post = Post.objects.create(author=self.user, body='pic', image=self.jpeg(300, 200))
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants['source'], post.image.name)
+        # 400 is wider than the (rotated) 200px source, so it collapses to 200
+        self.assertEqual(sorted(post.image_variants['widths']), ['100', '200'])
+        with post.image.storage.open(post.image_variants['widths']['200']) as fh:
+            img = Image.open(fh)
+            img.load()
+        self.assertEqual(img.format, 'WEBP')
+        self.assertEqual(img.size, (200, 300))
+        self.assertFalse(img.getexif())
+
+    def test_feed_serves_srcset_instead_of_the_original(self):
+        post = Post.objects.create(author=self.user, body='pic', image=self.jpeg(300, 200))
+        timeline.fan_out_post(post)
+        self.client.force_login(self.user)
+        html = self.client.get(reverse('social:feed')).content.decode()
+        self.assertIn('srcset=', html)
+        self.assertNotIn(post.image.url + '"', html)
+
+    def test_large_gifs_are_rejected(self):
+        from .forms import PostForm, ProfileForm, SignUpForm
+        buf = io.BytesIO()
+        frames = [Image.new('P', (64, 64), i) for i in range(4)]
+        frames[0].save(buf, 'GIF', save_all=True, append_images=frames[1:])
+
+        def gif():
+            return SimpleUploadedFile('big.gif', buf.getvalue(), content_type='image/gif')
+
+        signup = {'username': 'gif_fan', 'first_name': 'G', 'last_name': 'F', 'email': 'g@example.com',
+                  'password1': 'a-long-passphrase-1', 'password2': 'a-long-passphrase-1'}
+        forms = {
+            'image': lambda: PostForm(data={'body': 'x'}, files={'image': gif()}),
+            'avatar': lambda: ProfileForm(data={'bio': ''}, files={'avatar': gif()},
+                                          instance=self.user.profile),
+            'signup avatar': lambda: SignUpForm(data=signup, files={'avatar': gif()}),
+        }
+        for name, form in forms.items():
+            with self.subTest(field=name):
+                self.assertTrue(form().is_valid(), form().errors)
+                with override_settings(SOCIAL_GIF_MAX_BYTES=len(buf.getvalue()) - 1):
+                    bound = form()
+                    self.assertFalse(bound.is_valid())
+                    self.assertIn(name.split()[-1], bound.errors)
+
+
+@override_settings(SOCIAL_JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.register('test.record', max_attempts=2)(self.record)
+        self.addCleanup(jobs.REGISTRY.pop, 'test.record')
+
+    def record(self, value, fail=False):
+        self.calls.append(value)
+        if fail:
+            raise RuntimeError('boom')
+
+    def drain(self):
+        for job in jobs.claim(100):
+            jobs.run(job)
+
+    def test_idempotency_key_yields_one_job(self):
+        first = jobs.enqueue('test.record', key='k', value=1)
+        second = jobs.enqueue('test.record', key='k', value=2)
+        self.assertEqual(first.pk, second.pk)
+        self.drain()
+        jobs.enqueue('test.record', key='k', value=3)
+        self.drain()
+        self.assertEqual(self.calls, [1])
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        job = jobs.enqueue('test.record', value=1, fail=True)
+        with self.assertLogs('social.jobs', 'WARNING'):
+            self.drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('RuntimeError', job.last_error)
+        self.drain()  # not due yet
+        self.assertEqual(len(self.calls), 1)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        with self.assertLogs('social.jobs', 'ERROR'):
+            self.drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def stall(self, job):
+        jobs.claim(100)  # the worker dies mid-run
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+
+    @override_settings(SOCIAL_JOBS_TIMEOUT=60)
+    def test_jobs_that_never_finish_use_up_their_attempts(self):
+        job = jobs.enqueue('test.record', value=1)
+        self.stall(job)
+        jobs.requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+
+        self.stall(job)
+        with self.assertLogs('social.jobs', 'ERROR'):
+            jobs.requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(self.calls, [])
+
+    @override_settings(SOCIAL_JOBS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(jobs.enqueue('test.record', value=1))
+        self.assertEqual(self.calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_new_post_is_fanned_out_by_the_worker(self):
+        author = User.objects.create_user('author')
+        reader = User.objects.create_user('reader')
+        follows.follow(reader, author)
+        self.client.force_login(author)
+        self.client.post(reverse('social:post-create'), {'body': '**hi**'})
+        post = Post.objects.get()
+
+        # the author sees it right away; followers and the HTML wait for the worker
+        self.assertEqual(list(TimelineEntry.objects.values_list('user_id', flat=True)), [author.pk])
+        self.assertEqual(post.rendered_html, '')
+        self.drain()
+        post.refresh_from_db()
+        self.assertIn('<strong>hi</strong>', post.rendered_html)
+        self.assertTrue(TimelineEntry.objects.filter(user=reader, post=post).exists())
+
+
+    def test_reverted_edits_are_rendered_again(self):
+        author = User.objects.create_user('author')
+        post = Post.objects.create(author=author, body='*a*')
+        snippet = CodeSnippet.objects.create(author=author, title='s', language='python', code='a = 1')
+        self.drain()
+        for body, code in (('*b*', 'b = 2'), ('*a*', 'a = 1')):  # A -> B -> A
+            post.body, snippet.code = body, code
+            post.save()
+            snippet.save()
+            self.drain()
+        post.refresh_from_db()
+        snippet.refresh_from_db()
+        self.assertIn('<em>a</em>', post.rendered_html)
+        self.assertIn('highlight', snippet.highlighted_html)
+        self.assertEqual(snippet.highlighted_key, highlight_key('a = 1', 'python'))
+
+@override_settings(SOCIAL_JOBS_EAGER=False)
+class RunJobsCommandTests(TransactionTestCase):
+    def test_worker_drains_the_queue(self):
+        author = User.objects.create_user('author')
+        for i in range(5):
+            Post.objects.create(author=author, body=f'*post {i}*')
+        out = StringIO()
+        call_command('run_jobs', once=True, threads=1, stdout=out)
+        self.assertIn('5 ok', out.getvalue())
+        self.assertFalse(Post.objects.filter(rendered_html='').exists())
+        self.assertEqual(Job.objects.exclude(status=Job.DONE).count(), 0)
+
+
+class UnavailableSearchBackend(search.SearchBackend):
+    def __init__(self):
+        raise ImproperlyConfigured("not on this database")
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('searcher')
+        self.client.force_login(self.user)
+
+    def results(self, q, **params):
+        resp = self.client.get(reverse('social:search'), {'q': q, **params})
+        return [(h.kind, h.pk) for h in resp.context['hits']], resp.context['next_query']
+
+    @override_settings(SOCIAL_SEARCH_BACKEND='social.tests.UnavailableSearchBackend')
+    def test_writes_work_when_the_backend_cannot_run(self):
+        post = Post.objects.create(author=self.user, body='saved anyway')
+        Reply.objects.create(post=post, author=self.user, body='and replied to')
+        post.delete()
+        self.assertEqual(self.client.get(reverse('social:search')).status_code, 200)
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(reverse('social:search'), {'q': 'saved'})
+
+    def test_index_follows_saves_and_deletes(self):
+        post = Post.objects.create(author=self.user, body='Deploying django on sqlite')
+        reply = Reply.objects.create(post=post, author=self.user, body='sqlite is fine for this')
+        self.assertEqual(sorted(self.results('sqlite')[0]), [('post', post.pk), ('reply', reply.pk)])
+
+        post.body = 'Deploying django on postgres'
+        post.save()
+        self.assertEqual(self.results('sqlite')[0], [('reply', reply.pk)])
+
+        post.delete()  # cascades to the reply
+        self.assertEqual(self.results('django')[0], [])
+        self.assertEqual(self.results('sqlite')[0], [])
+
+    def test_prefix_language_filter_and_ranking(self):
+        py = CodeSnippet.objects.create(author=self.user, title='Paginator helper', language='python', code='def paginate(qs): ...')
+        js = CodeSnippet.objects.create(author=self.user, title='', language='javascript', code='// paginate a list')
+        post = Post.objects.create(author=self.user, body='how do you paginate?')
+        hits = self.results('pagin')[0]
+        self.assertEqual(hits[0], ('snippet', py.pk))  # title matches outrank body matches
+        self.assertEqual(set(hits), {('snippet', py.pk), ('snippet', js.pk), ('post', post.pk)})
+        self.assertEqual(self.results('pagin', lang='javascript')[0], [('snippet', js.pk)])
+        self.assertEqual(self.results('pagin', type='post')[0], [('post', post.pk)])
+
+    def test_cursor_pagination_and_query_syntax(self):
+        for i in range(5):
+            Post.objects.create(author=self.user, body=f'cursor test {i}')
+        seen, query = [], {'q': 'cursor'}
+        with override_settings(SOCIAL_SEARCH_PAGE_SIZE=2):
+            while True:
+                resp = self.client.get(reverse('social:search'), query)
+                seen += [h.pk for h in resp.context['hits']]
+                if not resp.context['next_query']:
+                    break
+                query = dict(parse_qsl(resp.context['next_query']))
+        self.assertEqual(sorted(seen), sorted(Post.objects.values_list('pk', flat=True)))
+
+        # FTS operators in user input are treated as plain words
+        resp = self.client.get(reverse('social:search'), {'q': 'cursor" OR NEAR( *'})
+        self.assertEqual(resp.status_code, 200)
+
+
+class CodeSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('coder')
+        self.client.force_login(self.user)
+        self.py = CodeSnippet.objects.create(
+            author=self.user, language='python',
+            code='post = get_object_or_404(Post, pk=pk)\nreturn render(request, "x.html")')
+        self.cpp = CodeSnippet.objects.create(
+            author=self.user, language='cpp', code='std::vector<int> getObjectOr404Ids();')
+
+    def results(self, q, **params):
+        resp = self.client.get(reverse('social:search'), {'q': q, 'type': 'code', **params})
+        return {h.pk for h in resp.context['hits']}
+
+    def test_identifiers_match_across_naming_styles(self):
+        self.assertEqual(self.results('get_object_or_404'), {self.py.pk, self.cpp.pk})
+        self.assertEqual(self.results('getObjectOr404', lang='python'), {self.py.pk})
+
+    def test_substrings_and_punctuation(self):
+        self.assertEqual(self.results('std::vector'), {self.cpp.pk})
+        self.assertEqual(self.results('404(Post'), {self.py.pk})
+        self.assertEqual(self.results('ject_or'), {self.py.pk, self.cpp.pk})  # partial words, either style
+        self.assertEqual(self.results('ab'), set())  # shorter than a trigram
+
+    def test_index_follows_edits_and_deletes(self):
+        self.cpp.code = 'std::map<int, int> m;'
+        self.cpp.save()
+        self.assertEqual(self.results('std::vector'), set())
+        self.assertEqual(self.results('std::map'), {self.cpp.pk})
+        self.cpp.delete()
+        self.assertEqual(self.results('std::map'), set())
+
+
+class SnippetHighlightTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('highlighter')
+
+    def test_highlighted_once_at_save_and_on_change(self):
+        snippet = CodeSnippet.objects.create(author=self.user, language='python', code='def f():\n    return 1')
+        self.assertIn('class="highlight"', snippet.highlighted_html)
+        self.assertIn('<span class="k">def</span>', snippet.highlighted_html)
+
+        key = snippet.highlighted_key
+        snippet.title = 'renamed'
+        snippet.save()
+        self.assertEqual(snippet.highlighted_key, key)
+        snippet.language = 'unknown-lang'
+        snippet.save()
+        self.assertNotEqual(snippet.highlighted_key, key)
+        self.assertNotIn('<span class="k">', snippet.highlighted_html)  # plain text fallback
+
+    def test_markdown_fences_share_the_snippet_theme(self):
+        post = Post.objects.create(author=self.user, body='```python\nimport os\n```')
+        self.assertIn('class="highlight"', post.rendered_html)
+
+
+class ExploreRankingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ranker')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        self.old = Post.objects.create(author=self.user, body='old', created_at=now - timedelta(hours=24))
+        self.new = Post.objects.create(author=self.user, body='new', created_at=now)
+
+    def explore(self, **params):
+        return self.client.get(reverse('social:explore'), params).context
+
+    def test_engagement_lifts_older_posts_after_rescore(self):
+        self.assertEqual(self.explore()['posts'], [self.new, self.old])
+        fans = [User.objects.create_user(f'fan{i}') for i in range(200)]
+        Reaction.objects.bulk_create(Reaction(post=self.old, user=u, kind=Reaction.LIKE) for u in fans)
+        Post.objects.filter(pk=self.old.pk).update(likes_count=len(fans))
+
+        self.assertEqual(ranking.rescore(), 1)
+        self.assertEqual(self.explore()['posts'], [self.old, self.new])
+        self.assertEqual(ranking.rescore(), 0)  # nothing changed since
+
+    @override_settings(SOCIAL_EXPLORE_PAGE_SIZE=1)
+    def test_keyset_pages_in_both_sorts(self):
+        for sort, expected in (('top', [self.new, self.old]), ('latest', [self.new, self.old])):
+            ctx = self.explore(sort=sort)
+            seen = list(ctx['posts'])
+            with CaptureQueriesContext(connection) as queries:
+                ctx = self.explore(sort=sort, cursor=ctx['next_cursor'])
+            seen += ctx['posts']
+            self.assertEqual(seen, expected)
+            self.assertIsNone(ctx['next_cursor'])
+            self.assertFalse([q for q in queries.captured_queries if 'OFFSET' in q['sql']])
+
+
+@override_settings(SOCIAL_REPLY_PREVIEW=2)
+class ReplyThreadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('talker')
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(author=self.user, body='thread')
+        timeline.fan_out_post(self.post)
+        self.replies = [Reply.objects.create(post=self.post, author=self.user, body=f'r{i}') for i in range(5)]
+
+    def test_reply_count_is_maintained_and_reconciled(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reply_count, 5)
+        self.replies.pop().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reply_count, 4)
+
+        Post.objects.filter(pk=self.post.pk).update(reply_count=40)
+        call_command('reconcile_counters', 'posts', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reply_count, 4)
+
+    def test_feed_preloads_only_the_latest_replies(self):
+        with CaptureQueriesContext(connection) as ctx:
+            post = self.client.get(reverse('social:feed')).context['posts'][0]
+        self.assertEqual([r.body for r in post.reply_list], ['r3', 'r4'])
+        self.assertEqual(post.reply_count, 5)
+        reply_queries = [q for q in ctx.captured_queries if 'FROM "social_reply"' in q['sql']]
+        self.assertEqual(len(reply_queries), 1)
+
+    @override_settings(SOCIAL_REPLY_PAGE_SIZE=2)
+    def test_thread_pages_walk_back_to_the_first_reply(self):
+        url = reverse('social:post-replies', args=[self.post.pk])
+        ctx = self.client.get(url).context
+        pages = [[r.body for r in ctx['replies']]]
+        while ctx['earlier_cursor']:
+            ctx = self.client.get(url, {'cursor': ctx['earlier_cursor']}).context
+            pages.append([r.body for r in ctx['replies']])
+        self.assertEqual(pages, [['r3', 'r4'], ['r1', 'r2'], ['r0']])
+
+
+class PostCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user('writer')
+        self.reader = User.objects.create_user('reader')
+        self.post = Post.objects.create(author=self.author, body='cached card')
+        self.client.force_login(self.reader)
+        self.url = reverse('social:explore') + '?sort=latest'
+
+    def outcomes(self):
+        stats = fragments.cards.stats()
+        return stats['hits'], stats['misses']
+
+    def test_second_render_is_a_hit_with_per_request_values(self):
+        hits, misses = self.outcomes()
+        self.client.get(self.url)
+        self.assertEqual(self.outcomes(), (hits, misses + 1))
+
+        other = self.client_class()
+        other.force_login(User.objects.create_user('lurker'))
+        html = other.get(self.url).content.decode()
+        self.assertEqual(self.outcomes(), (hits + 1, misses + 1))
+        for sentinel in (fragments.CSRF_SENTINEL, fragments.NEXT_SENTINEL, fragments.PATH_SENTINEL):
+            self.assertNotIn(sentinel, html)
+        self.assertIn('value="/explore/?sort=latest"', html)
+        self.assertIn('csrfmiddlewaretoken', html)
+
+    def test_edits_replies_and_viewer_state_change_the_card(self):
+        self.client.get(self.url)
+        self.post.body = 'edited body'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'edited body')
+
+        Reply.objects.create(post=self.post, author=self.author, body='fresh reply')
+        self.assertContains(self.client.get(self.url), 'fresh reply')
+
+        follows.follow(self.reader, self.author)
+        self.assertContains(self.client.get(self.url), '>Unfollow</button>')
+
+    def test_rerender_command_retires_cached_cards(self):
+        reply = Reply.objects.create(post=self.post, author=self.author, body='a reply')
+        # bodies written by an older renderer, cached in the card as such
+        Post.objects.filter(pk=self.post.pk).update(rendered_html='<p>old post html</p>', rendered_key='old')
+        Reply.objects.filter(pk=reply.pk).update(rendered_html='<p>old reply html</p>', rendered_key='old')
+        self.assertContains(self.client.get(self.url), 'old post html')
+
+        call_command('rerender_markdown', stdout=StringIO())
+        html = self.client.get(self.url).content.decode()
+        self.assertNotIn('old post html', html)
+        self.assertNotIn('old reply html', html)
+        self.assertIn('<p>cached card</p>', html)
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get(reverse('social:cache-metrics')).status_code, 302)
+        User.objects.filter(pk=self.reader.pk).update(is_staff=True)
+        data = self.client.get(reverse('social:cache-metrics')).json()
+        self.assertEqual(set(data['postcard']), {'hits', 'misses', 'hit_rate'})
+
+
+# Cache namespaces run against each configured backend
+class CacheNamespaceChecks:
+    def setUp(self):
+        caches['default'].clear()
+        self.ns = caching.Namespace('test-ns', timeout=60)
+
+    def test_clear_retires_only_its_namespace(self):
+        other = caching.Namespace('test-other', timeout=60)
+        self.ns.set(('a', 1), 'x')
+        other.set(('a', 1), 'y')
+        self.ns.clear()
+        self.assertIsNone(self.ns.get(('a', 1)))
+        self.assertEqual(other.get(('a', 1)), 'y')
+
+    def test_get_many_and_stats(self):
+        self.ns.set_many({1: 'one', 2: 'two'})
+        before = self.ns.stats()
+        self.assertEqual(self.ns.get_many([1, 2, 3]), {1: 'one', 2: 'two'})
+        after = self.ns.stats()
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (2, 1))
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.ns.get_or_set('hot', compute)))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_expensive_entries_refresh_early(self):
+        self.ns.get_or_set('k', lambda: 'old')
+        # pretend 'old' took a minute to build and expires in a second; a big
+        # beta makes the early refresh (near) certain
+        key = self.ns._prefix() + 'k'
+        self.ns.cache.set(key, ('old', time.time() + 1, 60.0), 60)
+        self.ns.beta = 1e6
+        self.assertEqual(self.ns.get_or_set('k', lambda: 'new'), 'new')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'namespace-tests'}})
+class LocMemNamespaceTests(CacheNamespaceChecks, TestCase):
+    pass
+
+
+class FileNamespaceTests(CacheNamespaceChecks, TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+
+# Point REDIS_URL at a local Redis-compatible server (e.g. `valkey-server`)
+# to run these; they're skipped otherwise.
+@unittest.skipUnless(os.environ.get('REDIS_URL'), 'REDIS_URL not set')
+class RedisNamespaceTests(CacheNamespaceChecks, TestCase):
+    def setUp(self):
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'devcentral-test',
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+
+class FollowCacheTests(TestCase):
+    def test_follow_and_unfollow_refresh_cached_ids_and_previews(self):
+        a, b = User.objects.create_user('ann'), User.objects.create_user('bob')
+        self.assertEqual(follows.followed_ids(a), set())
+        self.assertEqual(follows.preview(b, 'followers', 6), [])
+        follows.follow(a, b)
+        self.assertEqual(follows.followed_ids(a), {b.pk})
+        self.assertEqual(follows.preview(b, 'followers', 6), [a])
+        with self.assertNumQueries(0):
+            follows.is_following(a, b)
+        follows.unfollow(a, b)
+        self.assertFalse(follows.is_following(a, b))
+        self.assertEqual(follows.preview(a, 'following', 6), [])
+
+    def test_previews_of_different_sizes_are_not_mixed_up(self):
+        star = User.objects.create_user('star')
+        fans = [User.objects.create_user(f'fan{i}') for i in range(3)]
+        for fan in fans:
+            follows.follow(fan, star)
+        self.assertEqual(follows.preview(star, 'followers', 1), [fans[2]])
+        self.assertEqual(follows.preview(star, 'followers', 3), fans[::-1])
+        self.assertEqual(follows.preview(star, 'followers', 2), fans[:0:-1])
+        follows.unfollow(fans[2], star)
+        self.assertEqual(follows.preview(star, 'followers', 3), fans[1::-1])
+
+    @override_settings(SOCIAL_FOLLOW_CACHE_TIMEOUT=30)
+    def test_another_workers_follow_shows_up_after_the_timeout(self):
+        a, b = User.objects.create_user('ann'), User.objects.create_user('bob')
+        self.assertEqual(follows.followed_ids(a), set())
+        # made elsewhere: this process's cache isn't told
+        Follow.objects.create(follower=a, following=b)
+        self.assertEqual(follows.followed_ids(a), set())
+        later = time.time() + 31
+        with unittest.mock.patch('time.time', return_value=later):
+            self.assertEqual(follows.followed_ids(a), {b.pk})
+
+
+@override_settings(SOCIAL_MEMBER_PAGE_SIZE=2)
+class MemberDirectoryTests(TestCase):
+    def setUp(self):
+        members.index.reset()
+        cache.clear()
+        self.viewer = User.objects.create_user('viewer')
+        for name in ('Alice', 'alan', 'albert', 'bob'):
+            User.objects.create_user(name)
+        self.client.force_login(self.viewer)
+
+    def names(self, response):
+        return [u.username for u in response.context['users']]
+
+    def test_directory_pages_by_prefix(self):
+        url = reverse('social:users')
+        first = self.client.get(url, {'q': 'AL'})
+        self.assertEqual(self.names(first), ['alan', 'albert'])
+        second = self.client.get(url + '?' + first.context['next_query'])
+        self.assertEqual(self.names(second), ['Alice'])
+        self.assertEqual(second.context['next_query'], '')
+
+    def test_typeahead_follows_signups_and_deletions(self):
+        url = reverse('social:users-typeahead')
+        self.assertEqual([r['username'] for r in self.client.get(url, {'q': 'al'}).json()['results']],
+                         ['alan', 'albert', 'Alice'])
+        User.objects.create_user('alfred')
+        User.objects.get(username='alan').delete()
+        with self.assertNumQueries(2):  # session + user; the index answers from memory
+            results = self.client.get(url, {'q': 'al'}).json()['results']
+        self.assertEqual([r['username'] for r in results], ['albert', 'alfred', 'Alice'])
+        self.assertEqual(results[0]['url'], reverse('social:profile', args=['albert']))
+
+    def test_feed_suggests_members_not_followed_yet(self):
+        bob = User.objects.get(username='bob')
+        Profile.objects.filter(user=bob).update(follower_count=10)
+        suggested = self.client.get(reverse('social:feed')).context['suggested_members']
+        self.assertEqual(suggested[0], bob)
+        self.assertNotIn(self.viewer, suggested)
+        follows.follow(self.viewer, bob)
+        self.assertNotIn(bob, self.client.get(reverse('social:feed')).context['suggested_members'])
+
+
+class SqliteModeTests(SimpleTestCase):
+    def open(self, mode):
+        """A connection to a scratch file set up as SQLITE_MODES[mode], as alias 'sqlite_mode'."""
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        db = {**connection.settings_dict, 'NAME': os.path.join(workdir, 'db.sqlite3'), 'TEST': {}}
+        db.update({key: (dict(value) if key == 'OPTIONS' else value)
+                   for key, value in settings.SQLITE_MODES[mode].items()})
+        conn = connections['default'].__class__(db, alias='sqlite_mode')
+        connections['sqlite_mode'] = conn
+        self.addCleanup(connections.__delitem__, 'sqlite_mode')
+        self.addCleanup(conn.close)
+        return conn
+
+    def pragmas(self, conn):
+        with conn.cursor() as cursor:
+            return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store')}
+
+    def test_production_mode_uses_wal_and_immediate_transactions(self):
+        conn = self.open('production')
+        self.assertEqual(self.pragmas(conn), {'journal_mode': 'wal', 'synchronous': 1,  # NORMAL
+                                              'busy_timeout': 20000, 'temp_store': 2})  # MEMORY
+        with CaptureQueriesContext(conn) as queries, transaction.atomic(using='sqlite_mode'):
+            pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_basic_mode_leaves_the_file_alone(self):
+        conn = self.open('basic')
+        self.assertEqual(self.pragmas(conn)['journal_mode'], 'delete')
+        with CaptureQueriesContext(conn) as queries, transaction.atomic(using='sqlite_mode'):
+            pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN')
+
+
+# SimpleTestCase: TestCase's wrapping transaction would pin every read
+@override_settings(SOCIAL_DB_REPLICAS=['replica'])
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, view, request):
+        """Run ``view`` behind the middleware; return (response, alias it read from)."""
+        seen = []
+
+        def wrapped(request):
+            seen.append(self.router.db_for_read(Post))
+            return view(request)
+
+        response = contextvars.Context().run(ReadYourWritesMiddleware(wrapped), request)
+        return response, seen[0]
+
+    def test_reads_go_to_replica_until_something_is_written(self):
+        def view(request):
+            before = self.router.db_for_read(Post)
+            self.router.db_for_write(Post)
+            return HttpResponse(f'{before} {self.router.db_for_read(Post)}')
+
+        response, _ = self.route(view, self.factory.get('/'))
+        self.assertEqual(response.content, b'replica default')
+        self.assertIn('primary_db', response.cookies)
+
+        _, alias = self.route(lambda r: HttpResponse(), self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+        request = self.factory.get('/')
+        request.COOKIES['primary_db'] = '1'
+        response, alias = self.route(lambda r: HttpResponse(), request)
+        self.assertEqual(alias, 'default')
+        self.assertNotIn('primary_db', response.cookies)  # reading doesn't extend it
+
+    def test_pinned_views_read_the_primary(self):
+        view = routers.primary_only(lambda request: HttpResponse(self.router.db_for_read(Post)))
+        response, _ = self.route(view, self.factory.get('/'))
+        self.assertEqual(response.content, b'default')
+
+
+@override_settings(SOCIAL_DB_REPLICAS=['replica'])
+class ReplicaTransactionTests(TestCase):
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        def read():
+            routers.reset()
+            return routers.PrimaryReplicaRouter().db_for_read(Post)
+        self.assertEqual(contextvars.Context().run(read), 'default')  # inside TestCase's atomic
+
+
+class AsyncPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user('async_viewer')
+        self.author = User.objects.create_user('async_author')
+        follows.follow(self.viewer, self.author)
+        self.post = Post.objects.create(author=self.author, body='hello from async')
+        timeline.publish(self.post)
+        Reply.objects.create(post=self.post, author=self.viewer, body='async reply')
+        self.factory = AsyncRequestFactory()
+
+    async def get(self, view, *args, **params):
+        request = self.factory.get('/', params)
+        viewer = self.viewer
+
+        async def auser():
+            return viewer
+        request.auser, request.session = auser, {}
+        return await view(request, *args)
+
+    async def test_pages_render_posts_with_replies(self):
+        for view, args in ((async_views.feed_view, ()),
+                           (async_views.profile, ('async_author',)),
+                           (async_views.posts_explore, ())):
+            with self.subTest(view=view.__name__):
+                response = await self.get(view, *args)
+                self.assertContains(response, 'hello from async')
+                self.assertContains(response, 'async reply')
+
+    @override_settings(SOCIAL_PROFILE_PAGE_SIZE=1)
+    async def test_profile_is_paginated(self):
+        await Post.objects.acreate(author=self.author, body='newer async post')
+        response = await self.get(async_views.profile, 'async_author')
+        self.assertContains(response, 'newer async post')
+        self.assertNotContains(response, 'hello from async')
+        self.assertContains(response, 'Older posts')
+
+    async def test_unknown_profile_is_404(self):
+        with self.assertRaises(Http404):
+            await self.get(async_views.profile, 'nobody')
+
+
+# Live updates
+# -----------------------------------------------
+class RecordingBackend(live.LocalBackend):
+    sent = []
+
+    def publish(self, event):
+        RecordingBackend.sent.append(event)
+        super().publish(event)
+
+
+@override_settings(SOCIAL_LIVE_BACKEND='social.tests.RecordingBackend')
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        live.hub.close()
+        self.addCleanup(live.hub.close)
+        RecordingBackend.sent = []
+        self.viewer = User.objects.create_user('live_viewer')
+        self.author = User.objects.create_user('live_author')
+        self.stranger = User.objects.create_user('live_stranger')
+        follows.follow(self.viewer, self.author)
+        self.post = Post.objects.create(author=self.author, body='live post')
+        self.client.force_login(self.viewer)
+
+    def sent(self, kind):
+        return [e for e in RecordingBackend.sent if e['type'] == kind]
+
+    def post_json(self, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data or {}, HTTP_ACCEPT='application/json')
+
+    def test_reaction_answers_with_counts_and_publishes_them(self):
+        response = self.post_json(reverse('social:post-react', args=[self.post.pk, 'like']))
+        self.assertEqual(response.json()['my_reaction'], 'like')
+        self.assertEqual(response.json()['likes_count'], 1)
+        event = self.sent('counts')[-1]
+        self.assertEqual((event['post'], event['likes_count'], event['dislikes_count']), (self.post.pk, 1, 0))
+
+    def test_form_posts_still_redirect(self):
+        response = self.client.post(reverse('social:post-react', args=[self.post.pk, 'like']),
+                                    {'next': '/explore/'})
+        self.assertRedirects(response, '/explore/', fetch_redirect_response=False)
+
+    def test_share_reports_repeat_shares(self):
+        url = reverse('social:post-share', args=[self.post.pk])
+        first, second = self.post_json(url).json(), self.post_json(url).json()
+        self.assertTrue(first['shared'])
+        self.assertFalse(second['shared'])
+        self.assertEqual(second['shares_count'], 1)
+        self.assertEqual(len(self.sent('counts')), 1)
+
+    def test_reply_answers_with_rendered_item(self):
+        response = self.post_json(reverse('social:post-reply', args=[self.post.pk]), {'body': 'live reply'})
+        data = response.json()
+        self.assertIn('live reply', data['html'])
+        self.assertIn(f'data-reply="{data["reply"]}"', data['html'])
+        self.assertEqual(data['reply_count'], 1)
+        event = self.sent('reply')[-1]
+        self.assertEqual((event['post'], event['reply'], event['reply_count']), (self.post.pk, data['reply'], 1))
+
+    def test_empty_reply_is_rejected(self):
+        response = self.post_json(reverse('social:post-reply', args=[self.post.pk]), {'body': '  '})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Reply.objects.exists())
+
+    def test_follow_and_unfollow_answer_with_state(self):
+        self.assertEqual(self.post_json(reverse('social:follow', args=['live_stranger'])).json(),
+                         {'user': 'live_stranger', 'following': True})
+        self.assertEqual(self.post_json(reverse('social:unfollow', args=['live_stranger'])).json(),
+                         {'user': 'live_stranger', 'following': False})
+        self.assertEqual([e['following'] for e in self.sent('follow')], [True, False])
+
+    def test_new_post_points_at_its_card(self):
+        response = self.post_json(reverse('social:post-create'), {'body': 'fresh post'})
+        post = Post.objects.get(body='fresh post')
+        self.assertEqual(response.json()['card'], reverse('social:post-card', args=[post.pk]))
+        self.assertEqual(self.sent('post')[-1], {'type': 'post', 'post': post.pk, 'author': self.viewer.pk})
+        card = self.client.get(response.json()['card'])
+        self.assertContains(card, f'data-post="{post.pk}"')
+        self.assertContains(card, 'fresh post')
+
+    def test_feed_cards_mark_replies_for_live_js(self):
+        # live.js drops [data-no-replies] and skips replies it already shows
+        url = reverse('social:post-card', args=[self.post.pk])
+        self.assertContains(self.client.get(url), 'data-no-replies')
+        reply = Reply.objects.create(post=self.post, author=self.viewer, body='first')
+        card = self.client.get(url)
+        self.assertContains(card, f'data-reply="{reply.pk}"')
+        self.assertNotContains(card, 'data-no-replies')
+
+    def test_stream_needs_asgi(self):
+        request = RequestFactory().get('/live/')
+        request.user = self.viewer
+        self.assertEqual(views.live_stream(request).status_code, 204)
+
+    async def test_stream_sends_followed_posts_only(self):
+        request = AsyncRequestFactory().get('/live/')
+        viewer = self.viewer
+
+        async def auser():
+            return viewer
+        request.auser, request.session = auser, {}
+        response = await async_views.live_stream(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        live.hub.publish({'type': 'post', 'post': 1, 'author': self.stranger.pk})
+        live.hub.publish({'type': 'post', 'post': 2, 'author': self.author.pk})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertTrue(chunk.startswith(b'event: post\ndata: '))
+        self.assertIn(b'"post": 2', chunk)
+
+    async def test_follow_event_changes_whose_posts_arrive(self):
+        with live.hub.subscribe(self.viewer.pk, []) as sub:
+            live.hub.publish({'type': 'post', 'post': 1, 'author': self.stranger.pk})
+            live.hub.publish({'type': 'follow', 'user': self.viewer.pk, 'target': self.stranger.pk,
+                              'username': 'live_stranger', 'following': True})
+            live.hub.publish({'type': 'post', 'post': 2, 'author': self.stranger.pk})
+            self.assertEqual((await asyncio.wait_for(sub.get(), 1))['type'], 'follow')
+            self.assertEqual((await asyncio.wait_for(sub.get(), 1))['post'], 2)
+
+    @override_settings(SOCIAL_LIVE_QUEUE_SIZE=2)
+    async def test_slow_stream_is_told_to_resync(self):
+        with live.hub.subscribe(self.viewer.pk, []) as sub:
+            for n in range(3):
+                live.hub.publish({'type': 'counts', 'post': n})
+            self.assertEqual(await asyncio.wait_for(sub.get(), 1), {'type': 'resync'})
+            self.assertTrue(sub.queue.empty())
@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import BigIntegerField, OuterRef, Q, Subquery, Value
+
+from . import jobs
+from .models import Follow, Post, Profile, Share, TimelineEntry
+from .pagination import encode_cursor, keyset_q
+
+User = get_user_model()
+
+# Home timelines
+# -----------------------------------------------
+# Every user has a precomputed list of TimelineEntry rows (their own posts plus
+# posts from people they follow), so the feed is one indexed range scan on
+# (user, created_at, post) instead of an "author IN (...)" query over all posts.
+#
+# Hybrid fan-out: authors with more than SOCIAL_TIMELINE_FANOUT_LIMIT followers
+# are flagged `fanout_on_read` and their posts are NOT copied into follower
+# timelines (one celebrity post would otherwise mean a write storm). Their posts
+# are merged in at read time instead, in the same SQL statement.
+#
+# Reshares are timeline rows too (shared_by set, created_at = share time), so
+# originals and reshares come out of one ordered, paginated scan. A post is in
+# a timeline at most once: whichever of original/reshare arrived first wins.
+#
+# The push to followers runs as a background job (publish() / social.tasks);
+# the author's own entry is written inline so they see their post at once.
+
+BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    return getattr(settings, 'SOCIAL_TIMELINE_FANOUT_LIMIT', 5000)
+
+
+def backfill_size():
+    return getattr(settings, 'SOCIAL_TIMELINE_BACKFILL', 200)
+
+
+def _entries(user_ids, post, share=None):
+    return [
+        TimelineEntry(user_id=uid, post_id=post.pk, author_id=post.author_id,
+                      shared_by_id=share.user_id if share else None,
+                      created_at=share.created_at if share else post.created_at)
+        for uid in user_ids
+    ]
+
+
+def _push(author, post, share=None):
+    """Insert one entry per follower of ``author``, in batches."""
+    follower_ids = (Follow.objects
+                    .filter(following=author)
+                    .values_list('follower_id', flat=True)
+                    .iterator(chunk_size=BATCH_SIZE))
+    batch = []
+    for uid in follower_ids:
+        batch.append(uid)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(_entries(batch, post, share), ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(_entries(batch, post, share), ignore_conflicts=True)
+
+
+def uses_fanout_on_read(author):
+    """Decide (and remember) whether ``author`` is too popular for fan-out.
+
+    The flag is sticky: once set we never go back, so posts that were only
+    merged at read time never silently drop out of followers' feeds.
+    """
+    profile = author.profile
+    if not profile.fanout_on_read and profile.follower_count > fanout_limit():
+        Profile.objects.filter(pk=profile.pk).update(fanout_on_read=True)
+        profile.fanout_on_read = True
+    return profile.fanout_on_read
+
+
+def fan_out_post(post):
+    """Push a new post into its author's and followers' timelines."""
+    author = post.author
+    TimelineEntry.objects.bulk_create(_entries([author.pk], post), ignore_conflicts=True)
+    if not uses_fanout_on_read(author):
+        _push(author, post)
+
+
+def publish(post):
+    """Show a new post to its author right away; queue the push to followers."""
+    TimelineEntry.objects.bulk_create(_entries([post.author_id], post), ignore_conflicts=True)
+    jobs.enqueue('timeline.fan_out_post', key=f'fanout:post:{post.pk}', post_id=post.pk)
+
+
+def fan_out_share(share):
+    """Push a reshare into the sharer's followers' timelines."""
+    sharer, post = share.user, share.post
+    if not uses_fanout_on_read(sharer):
+        _push(sharer, post, share)
+
+
+def backfill(user, author):
+    """Copy ``author``'s recent posts and reshares into ``user``'s timeline after a follow."""
+    if author.profile.fanout_on_read:
+        return  # merged at read time anyway
+    recent = _recent_posts(author)
+    reshares = (Share.objects
+                .filter(user=author)
+                .select_related('post')
+                .only('user_id', 'created_at', 'post__id', 'post__author_id')
+                .order_by('-created_at')[:backfill_size()])
+    TimelineEntry.objects.bulk_create(
+        [e for p in recent for e in _entries([user.pk], p)]
+        + [e for s in reshares for e in _entries([user.pk], s.post, s)],
+        ignore_conflicts=True,
+    )
+
+
+def trim(user, author):
+    """Drop ``author``'s posts and reshares from ``user``'s timeline after an unfollow."""
+    entries = TimelineEntry.objects.filter(user=user)
+    entries.filter(author=author, shared_by__isnull=True).delete()
+    # A reshare that arrived before the original holds the post's only row
+    # (one per post); if the user still sees the original author, turn it
+    # back into a plain entry instead of losing the post.
+    reshares = entries.filter(shared_by=author)
+    reshares.filter(Q(post__author=user) | Q(post__author__followers_set__follower=user)).update(
+        shared_by=None,
+        created_at=Subquery(Post.objects.filter(pk=OuterRef('post_id')).values('created_at')),
+    )
+    reshares.delete()
+
+
+def _recent_posts(author):
+    return (Post.objects
+            .filter(author=author)
+            .order_by('-created_at', '-id')
+            .only('id', 'author_id', 'created_at')[:backfill_size()])
+
+
+def rebuild(user):
+    """Recreate one user's timeline from scratch (own posts + followed authors)."""
+    TimelineEntry.objects.filter(user=user).delete()
+    # like publish(), own posts are always stored, even for fanout_on_read
+    # authors: the read-time merge only covers people the user follows
+    TimelineEntry.objects.bulk_create(
+        [e for p in _recent_posts(user) for e in _entries([user.pk], p)], ignore_conflicts=True,
+    )
+    for author in User.objects.filter(followers_set__follower=user).select_related('profile'):
+        backfill(user, author)
+
+
+def timeline_page(user, cursor, size):
+    """Return (posts, next_cursor) for one page of ``user``'s home feed.
+
+    ``cursor`` is a decoded (created_at, post_id) tuple or None. Reshared
+    posts come back with ``post.shared_by`` set to the sharing user.
+    """
+    order = ('-created_at', '-post_id')
+    rows = TimelineEntry.objects.filter(user=user)
+    if cursor:
+        rows = rows.filter(keyset_q(order, cursor))
+    rows = rows.values_list('created_at', 'post_id', 'shared_by_id')
+
+    pull_ids = list(Profile.objects
+                    .filter(fanout_on_read=True, user__followers_set__follower=user)
+                    .values_list('user_id', flat=True))
+    if pull_ids:
+        pulled = (Post.objects
+                  .filter(author_id__in=pull_ids)
+                  .annotate(no_sharer=Value(None, output_field=BigIntegerField())))
+        reshared = Share.objects.filter(user_id__in=pull_ids)
+        if cursor:
+            pulled = pulled.filter(keyset_q(('-created_at', '-id'), cursor))
+            reshared = reshared.filter(keyset_q(('-created_at', '-post_id'), cursor))
+        # UNION (not UNION ALL) also dedupes posts that were fanned out
+        # before the author crossed the limit.
+        rows = rows.union(
+            pulled.values_list('created_at', 'id', 'no_sharer'),
+            reshared.values_list('created_at', 'post_id', 'user_id'),
+        )
+
+    keys = list(rows.order_by(*order)[:size + 1])
+    next_cursor = None
+    if len(keys) > size:
+        keys = keys[:size]
+        next_cursor = encode_cursor(*keys[-1][:2])
+
+    by_id = (Post.objects
+             .select_related('author', 'author__profile')
+             .in_bulk([pk for _, pk, _ in keys]))
+    sharer_ids = {uid for _, _, uid in keys if uid}
+    sharers = User.objects.in_bulk(sharer_ids) if sharer_ids else {}
+
+    posts, seen = [], set()
+    for _, pk, uid in keys:
+        if pk in by_id and pk not in seen:  # read-time merge can repeat a post
+            seen.add(pk)
+            post = by_id[pk]
+            post.shared_by = sharers.get(uid)
+            posts.append(post)
+    return posts, next_cursor
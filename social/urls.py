@@ -1,23 +1,37 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the read-heavy pages and the live update stream use their async
+# versions (social/async_views.py)
+pages = async_views if getattr(settings, 'SOCIAL_ASYNC_VIEWS', False) else views
 
 # Keep app_name only if you also namespace when including (see note below)
 app_name = 'social'
 
 urlpatterns = [
-    path('', views.feed_view, name='feed'),
+    path('', pages.feed_view, name='feed'),
     path('signup/', views.signup_view, name='signup'),
-    path('u/<str:username>/', views.profile, name='profile'),
+    path('u/<str:username>/', pages.profile, name='profile'),
     path('u/<str:username>/follow/', views.follow, name='follow'),
     path('u/<str:username>/unfollow/', views.unfollow, name='unfollow'),
+    path('u/<str:username>/followers/', views.follow_list, {'direction': 'followers'}, name='followers'),
+    path('u/<str:username>/following/', views.follow_list, {'direction': 'following'}, name='following'),
     path('account/delete/', views.account_delete, name='account_delete'),
     path('post/create/', views.create_post, name='post-create'),
+    path('post/<int:pk>/card/', views.post_card, name='post-card'),
     path('post/<int:pk>/edit/', views.post_edit, name='post-edit'),
     path('post/<int:pk>/delete/', views.post_delete, name='post-delete'),
-    path('post/<int:pk>/<str:action>/', views.post_react, name='post-react'),
+    # share/reply must come before the catch-all reaction route
     path('post/<int:pk>/share/', views.post_share, name='post-share'),
     path('post/<int:pk>/reply/', views.post_reply, name='post-reply'),
+    path('post/<int:pk>/replies/', views.post_replies, name='post-replies'),
+    path('post/<int:pk>/<str:action>/', views.post_react, name='post-react'),
     path('users/', views.users_list, name='users'),
-    path('explore/', views.posts_explore, name='explore'),
+    path('users/typeahead/', views.members_typeahead, name='users-typeahead'),
+    path('explore/', pages.posts_explore, name='explore'),
+    path('search/', views.search_view, name='search'),
+    path('live/', pages.live_stream, name='live'),
+    path('metrics/cache/', views.cache_metrics, name='cache-metrics'),
 
 ]
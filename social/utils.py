@@ -1,29 +1,124 @@
+import hashlib
+import html
+import re
+from urllib.parse import urlsplit
+
 import markdown
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import TextLexer, get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from .caching import Namespace
+
+# Bump whenever the extensions/options below change: every stored
+# rendered_html whose key was computed with an older version becomes stale
+# and is picked up by `manage.py rerender_markdown`.
+RENDERER_VERSION = 4
+
+# Pygments output for both Markdown code fences and code snippets uses this
+# class, so one stylesheet (static/css/pygments.css) themes them all.
+HIGHLIGHT_CSS_CLASS = 'highlight'
+HIGHLIGHT_VERSION = 1  # same idea as RENDERER_VERSION, for snippets
+
+# keyed by content hash, so entries never go stale
+markdown_cache = Namespace('markdown', timeout=24 * 3600)
+highlight_cache = Namespace('highlight', timeout=24 * 3600)
+
+
+# Stored HTML is printed with |safe, so bodies may not carry markup of their
+# own: raw HTML in a body is escaped like any other text, and links/images
+# keep only URLs with a harmless scheme (no javascript:, data:, ...).
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+# browsers ignore these anywhere in a URL ("java\tscript:" is javascript:)
+_URL_IGNORED = re.compile(r'[\x00-\x20\x7f]+')
+
+
+def safe_url(url: str) -> bool:
+    """Whether ``url`` (attribute text as written) has a harmless scheme."""
+    # Markdown keeps entities in attributes as written; the browser decodes
+    # them, so "&#106;avascript:" and "javascript&colon;" are javascript:
+    url = _URL_IGNORED.sub('', html.unescape(url))
+    try:
+        return urlsplit(url).scheme.lower() in SAFE_URL_SCHEMES
+    except ValueError:
+        return False
+
+
+class _SafeUrls(Treeprocessor):
+    def run(self, root):
+        for el in root.iter():
+            for attr in ('href', 'src'):
+                url = el.get(attr)
+                if url is not None and not safe_url(url):
+                    del el.attrib[attr]
+
+
+class EscapeHtml(Extension):
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(_SafeUrls(md), 'safe_urls', 0)
+
 
 def render_markdown(text: str) -> str:
     return markdown.markdown(
         text or "",
-        extensions=['fenced_code', 'codehilite'],
+        extensions=['fenced_code', 'codehilite', EscapeHtml()],
+        extension_configs={'codehilite': {'css_class': HIGHLIGHT_CSS_CLASS}},
         output_format='html5'
     )
 
-def render_markdown(text: str) -> str:
-    return markdown.markdown(
-        text or "",
-        extensions=['fenced_code', 'codehilite'],
-        output_format='html5'
+
+def markdown_key(text: str) -> str:
+    """Content hash + renderer version that identifies a rendered body."""
+    raw = f"{RENDERER_VERSION}:{text or ''}".encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def ensure_rendered(instance, force=False) -> bool:
+    """Refresh ``instance.rendered_html`` if its body changed (or ``force``).
+
+    Works for any model with body / rendered_html / rendered_key fields.
+    Returns True when the HTML was (re)rendered.
+    """
+    key = markdown_key(instance.body)
+    if not force and instance.rendered_key == key and instance.rendered_html:
+        return False
+    # identical bodies (re-renders, edits reverted, bulk jobs) hit the cache
+    instance.rendered_html = markdown_cache.get_or_set(key, lambda: render_markdown(instance.body))
+    instance.rendered_key = key
+    return True
+
+
+def highlight_code(code: str, language: str) -> str:
+    """Syntax-highlight ``code`` as HTML with Pygments (plain text if unknown)."""
+    try:
+        # startinline: PHP snippets rarely start with "<?php"
+        lexer = get_lexer_by_name(language or 'text', startinline=True)
+    except ClassNotFound:
+        lexer = TextLexer()
+    return highlight(code or '', lexer, HtmlFormatter(cssclass=HIGHLIGHT_CSS_CLASS, wrapcode=True))
+
+
+def highlight_key(code: str, language: str) -> str:
+    raw = f"{HIGHLIGHT_VERSION}:{language or ''}:{code or ''}".encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def ensure_highlighted(snippet, force=False) -> bool:
+    """Refresh ``snippet.highlighted_html`` if its code or language changed.
+
+    Returns True when the HTML was (re)generated.
+    """
+    key = highlight_key(snippet.code, snippet.language)
+    if not force and snippet.highlighted_key == key and snippet.highlighted_html:
+        return False
+    snippet.highlighted_html = highlight_cache.get_or_set(
+        key, lambda: highlight_code(snippet.code, snippet.language),
     )
-    
-from .utils import render_markdown
-def profile_view(request, username):
-    # ... existing code to find profile_user, posts, etc.
-    posts = Post.objects.filter(author=profile_user).order_by('-created_at')
-
-    for p in posts:
-        p.rendered_html = render_markdown(p.body)
-
-    return render(request, 'profile.html', {
-        'profile_user': profile_user,
-        'posts': posts,
-        # ... other context
-    })
\ No newline at end of file
+    snippet.highlighted_key = key
+    return True
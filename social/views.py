@@ -1,24 +1,34 @@
-from django.core.paginator import Paginator
 from django.contrib import messages
 from django.contrib.auth import login, logout, get_user_model
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, F
+from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import HttpResponseNotAllowed, HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseForbidden, JsonResponse
 from django.views.decorators.http import require_POST
-from collections import defaultdict
-from .utils import render_markdown
+from datetime import datetime
+from . import caching, follows, fragments, live, members, reactions, replies, search, timeline
+from .pagination import decode_cursor, encode_cursor, keyset_page, page_size
+from .routers import primary_only
+from .counters import post_counters
 from .forms import (
     SignUpForm, PostForm, ReplyForm, ProfileForm,
-    CodeSnippetForm, AccountDeleteForm
+    CodeSnippetForm, AccountDeleteForm, LANGUAGE_CHOICES
 )
 from .models import Post, Reply, CodeSnippet, Follow
 from django.urls import reverse  # <-- ensure this import exists
+from urllib.parse import urlencode
 from django.db.models import Prefetch
 
 
 User = get_user_model()
 
+
+def wants_json(request):
+    # the write actions answer fetch() calls from live.js with JSON instead
+    # of a redirect and a whole page render; plain form posts still redirect
+    return 'application/json' in request.headers.get('Accept', '')
+
 # -----------------------
 # Auth / Signup
 # -----------------------
@@ -31,7 +41,8 @@ def signup_view(request):
             p.bio = form.cleaned_data.get('bio', '')
             if form.cleaned_data.get('avatar'):
                 p.avatar = form.cleaned_data['avatar']
-            p.save()
+            # never write the denormalized follow counters from a form
+            p.save(update_fields=['bio', 'avatar'])
             login(request, user)
             return redirect('social:feed')
         else:
@@ -45,35 +56,28 @@ def signup_view(request):
 # -----------------------
 @login_required
 def feed_view(request):
-    following_ids = request.user.following.values_list('id', flat=True)
-    posts = (Post.objects
-            .select_related('author', 'author__profile')
-            .filter(Q(author=request.user) | Q(author__id__in=following_ids))
-            .order_by('-created_at'))
-
-    for p in posts:
-        p.rendered_html = render_markdown(p.body)
-
-    all_users = (User.objects
-                .select_related('profile')
-                .exclude(id=request.user.id)
-                .order_by('username'))
-
-    # collect replies for these posts (works regardless of related_name)
-    post_ids = [p.id for p in posts]
-    reply_map = defaultdict(list)
-    for r in Reply.objects.filter(post_id__in=post_ids).select_related('author', 'author__profile'):
-        reply_map[r.post_id].append(r)
-
-    for p in posts:
-        p.reply_list = reply_map.get(p.id, [])
-        p.reply_count = len(p.reply_list)
+    # Keyset pagination on (created_at, id) over the user's precomputed
+    # timeline: "load older" is a range scan from the last post we showed,
+    # so deep pages cost the same as page one.
+    cursor = decode_cursor(request.GET.get('cursor'), datetime, int)
+    posts, next_cursor = timeline.timeline_page(
+        request.user, cursor, page_size('SOCIAL_FEED_PAGE_SIZE', 20),
+    )
+
+    # latest few replies per post; the full thread is on post-replies
+    replies.attach_latest(posts)
+    reactions.annotate_posts(request.user, posts)
+    post_counters.overlay(posts)
+    fragments.prime(posts)
 
     context = {
         'posts': posts,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
         'post_form': PostForm(),
         'reply_form': ReplyForm(),
-        'all_users': all_users,
+        'suggested_members': members.suggested(request.user),
+        'followed_ids': follows.followed_ids(request.user),
     }
     # Your files are at social/templates/*.html → render without the "social/" prefix
     return render(request, 'feed.html', context)
@@ -86,12 +90,33 @@ def create_post(request):
             obj = f.save(commit=False)
             obj.author = request.user
             obj.save()
+            timeline.publish(obj)
+            if wants_json(request):
+                return JsonResponse({'post': obj.pk, 'card': reverse('social:post-card', args=[obj.pk])})
+        elif wants_json(request):
+            return JsonResponse({'errors': f.errors}, status=400)
     return redirect('social:feed')
 
+@login_required
+def post_card(request, pk):
+    # One feed card on its own, for live.js to insert a post that was just
+    # published. Its forms are submitted through live.js, so their "next"
+    # fields (this URL) are never followed.
+    post = get_object_or_404(Post.objects.select_related('author', 'author__profile'), pk=pk)
+    posts = [post]
+    replies.attach_latest(posts)
+    reactions.annotate_posts(request.user, posts)
+    post_counters.overlay(posts)
+    return render(request, 'social/_feed_card.html', {
+        'post': post,
+        'followed_ids': follows.followed_ids(request.user),
+    })
+
 # -----------------------
 # Posts (edit / delete / reply / react / share)
 # -----------------------
 @login_required
+@primary_only  # the form must show what was just saved
 def post_edit(request, pk):
     post = get_object_or_404(Post, pk=pk)
     if post.author != request.user:
@@ -121,18 +146,40 @@ def post_reply(request, pk):
 
     body = (request.POST.get("body") or "").strip()
     if not body:
+        if wants_json(request):
+            return JsonResponse({'error': "Reply can’t be empty."}, status=400)
         messages.error(request, "Reply can’t be empty.")
         return redirect(next_url)
 
     try:
-        Reply.objects.create(post=post, author=request.user, body=body)
-        messages.success(request, "Reply posted.")
+        reply = Reply.objects.create(post=post, author=request.user, body=body)
     except Exception as e:
+        if wants_json(request):
+            return JsonResponse({'error': f"Couldn’t post reply: {e!s}"}, status=400)
         messages.error(request, f"Couldn’t post reply: {e!s}")
+        return redirect(next_url)
 
+    if wants_json(request):
+        return JsonResponse({'post': post.pk, 'reply': reply.pk, 'html': live.reply_html(reply),
+                             **live.post_counts(post.pk)})
+    messages.success(request, "Reply posted.")
     return redirect(next_url)
 
 
+@login_required
+def post_replies(request, pk):
+    # Full reply thread, a page at a time walking back from the newest.
+    post = get_object_or_404(Post.objects.select_related('author', 'author__profile'), pk=pk)
+    cursor = decode_cursor(request.GET.get('cursor'), datetime, int)
+    thread, earlier_cursor = replies.thread_page(post, cursor, page_size('SOCIAL_REPLY_PAGE_SIZE', 50))
+    return render(request, 'post_replies.html', {
+        'post': post,
+        'replies': thread,
+        'earlier_cursor': earlier_cursor,
+        'is_first_page': cursor is None,
+    })
+
+
 @login_required
 def post_delete(request, pk):
     if request.method != "POST":
@@ -148,19 +195,30 @@ def post_delete(request, pk):
 def post_react(request, pk, action):
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
-    post = get_object_or_404(Post, pk=pk)
-    if action == "like":
-        Post.objects.filter(pk=post.pk).update(likes_count=F("likes_count") + 1)
-    elif action == "dislike":
-        Post.objects.filter(pk=post.pk).update(dislikes_count=F("dislikes_count") + 1)
+    if action not in reactions.COUNT_FIELDS:
+        raise Http404("Unknown reaction.")
+    # existence check only: the counter itself is written behind (post_counters)
+    if not Post.objects.filter(pk=pk).exists():
+        raise Http404("No such post.")
+    mine = reactions.toggle(request.user, pk, action)
+    counts = live.counts_changed(pk)
+    if wants_json(request):
+        return JsonResponse({'post': pk, 'my_reaction': mine, **counts})
     return redirect(request.POST.get("next") or "social:feed")
 
 @login_required
 def post_share(request, pk):
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
-    post = get_object_or_404(Post, pk=pk)
-    Post.objects.filter(pk=post.pk).update(shares_count=F("shares_count") + 1)
+    post = get_object_or_404(Post.objects.only('id', 'author_id', 'created_at'), pk=pk)
+    shared = reactions.share(request.user, post)
+    if wants_json(request):
+        counts = live.counts_changed(pk) if shared else live.post_counts(pk)
+        return JsonResponse({'post': pk, 'shared': shared, **counts})
+    if shared:
+        live.counts_changed(pk)
+    else:
+        messages.info(request, "You already shared this post.")
     return redirect(request.POST.get("next") or "social:feed")
 
 # -----------------------
@@ -215,10 +273,16 @@ def follow(request, username):
     target = get_object_or_404(User, username=username)
 
     if request.user == target:
+        if wants_json(request):
+            return JsonResponse({'error': "You can't follow yourself."}, status=400)
         messages.info(request, "You can't follow yourself.")
     else:
-        # Idempotent: M2M add won't duplicate
-        target.profile.followers.add(request.user)
+        # Idempotent: an existing edge is left alone
+        if follows.follow(request.user, target):
+            timeline.backfill(request.user, target)
+            live.follow_changed(request.user, target, True)
+        if wants_json(request):
+            return JsonResponse({'user': target.username, 'following': True})
         messages.success(request, f"You’re now following @{target.username}.")
 
     next_url = (request.POST.get("next")
@@ -232,9 +296,15 @@ def unfollow(request, username):
     target = get_object_or_404(User, username=username)
 
     if request.user == target:
+        if wants_json(request):
+            return JsonResponse({'error': "You can't unfollow yourself."}, status=400)
         messages.info(request, "You can't unfollow yourself.")
     else:
-        target.profile.followers.remove(request.user)
+        if follows.unfollow(request.user, target):
+            timeline.trim(request.user, target)
+            live.follow_changed(request.user, target, False)
+        if wants_json(request):
+            return JsonResponse({'user': target.username, 'following': False})
         messages.info(request, f"You unfollowed @{target.username}.")
 
     next_url = (request.POST.get("next")
@@ -251,49 +321,37 @@ def unfollow(request, username):
 def profile(request, username):
     profile_user = get_object_or_404(User.objects.select_related("profile"), username=username)
 
-    # Followers: Users who follow this profile_user
-    followers = profile_user.profile.followers.select_related("profile").order_by("username")
-    follower_count = followers.count()
+    # Followers / following: only a small preview inline, newest first; the
+    # full lists are paginated on their own pages (follow_list).
+    preview = page_size('SOCIAL_FOLLOW_PREVIEW', 6)
+    followers = follows.preview(profile_user, 'followers', preview)
+    following = follows.preview(profile_user, 'following', preview)
 
-    # Following: Profiles that THIS user follows (Profile queryset)
-    following_profiles = profile_user.following.select_related("user", "user__profile").order_by("user__username")
-    following_count = following_profiles.count()
+    # Counts are denormalized on Profile (maintained in social.follows)
+    follower_count = profile_user.profile.follower_count
+    following_count = profile_user.profile.following_count
 
     # Is the current viewer following this profile?
-    is_following = False
-    if request.user.is_authenticated and request.user != profile_user:
-        is_following = profile_user.profile.followers.filter(pk=request.user.pk).exists()
-
-    # User's posts
-    posts = (Post.objects
-             .filter(author=profile_user)
-             .select_related('author', 'author__profile')
-             .order_by('-created_at'))
-
-    for p in posts:
-        try:
-            p.rendered_html = render_markdown(p.body)
-        except Exception:
-            p.rendered_html = None
-
-    # Attach replies (optional but keeps consistent with feed/explore)
-    post_ids = [p.id for p in posts]
-    reply_map = defaultdict(list)
-    for r in (Reply.objects
-              .filter(post_id__in=post_ids)
-              .select_related('author', 'author__profile')
-              .order_by('created_at')):
-        reply_map[r.post_id].append(r)
-    for p in posts:
-        p.reply_list = reply_map.get(p.id, [])
-        p.reply_count = len(p.reply_list)
+    is_following = follows.is_following(request.user, profile_user)
+
+    # User's posts, newest first, one keyset page at a time
+    cursor = decode_cursor(request.GET.get('cursor'), datetime, int)
+    posts, next_cursor = keyset_page(
+        Post.objects.filter(author=profile_user).select_related('author', 'author__profile'),
+        ('-created_at', '-id'), cursor, page_size('SOCIAL_PROFILE_PAGE_SIZE', 20),
+    )
+
+    # latest few replies per post; the full thread is on post-replies
+    replies.attach_latest(posts)
+    reactions.annotate_posts(request.user, posts)
+    post_counters.overlay(posts)
 
     # Edit form only for the owner
     form = ProfileForm(instance=request.user.profile) if request.user == profile_user else None
     if request.method == 'POST' and form:
         form = ProfileForm(request.POST, request.FILES, instance=request.user.profile)
         if form.is_valid():
-            form.save()
+            form.instance.save(update_fields=ProfileForm.Meta.fields)
             messages.success(request, "Profile updated.")
             return redirect('social:profile', username=profile_user.username)
 
@@ -301,19 +359,49 @@ def profile(request, username):
         "profile_user": profile_user,
         "followers": followers,
         "follower_count": follower_count,
-        "following": following_profiles,
+        "following": following,
         "following_count": following_count,
         "is_following": is_following,
         "posts": posts,
+        "next_cursor": next_cursor,
+        "is_first_page": cursor is None,
         "reply_form": ReplyForm(),
         "form": form,
     })
 
 
+@login_required
+def follow_list(request, username, direction):
+    profile_user = get_object_or_404(User.objects.select_related("profile"), username=username)
+    if direction == 'followers':
+        qs = Follow.objects.filter(following=profile_user).select_related('follower', 'follower__profile')
+        total = profile_user.profile.follower_count
+    else:
+        qs = Follow.objects.filter(follower=profile_user).select_related('following', 'following__profile')
+        total = profile_user.profile.following_count
+
+    cursor = decode_cursor(request.GET.get('cursor'), datetime, int)
+    edges, next_cursor = keyset_page(
+        qs, ('-created_at', '-id'), cursor, page_size('SOCIAL_FOLLOW_PAGE_SIZE', 50),
+    )
+    people = [e.follower if direction == 'followers' else e.following for e in edges]
+
+    return render(request, 'follow_list.html', {
+        'profile_user': profile_user,
+        'direction': direction,
+        'people': people,
+        'total': total,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+        'followed_ids': follows.followed_ids(request.user),
+    })
+
+
 # -----------------------
 # Account delete
 # -----------------------
 @login_required
+@primary_only
 def account_delete(request):
     if request.method == 'POST':
         form = AccountDeleteForm(request.POST)
@@ -336,46 +424,119 @@ def account_delete(request):
 # -----------------------
 @login_required
 def users_list(request):
-    users = User.objects.select_related('profile').order_by('username')
-    return render(request, 'users_list.html', {'users': users})
+    # Keyset pages over the in-memory username index (social.members), with
+    # an optional case-insensitive prefix filter.
+    q = (request.GET.get('q') or '').strip()
+    cursor = decode_cursor(request.GET.get('cursor'), str, int)
+    rows, last = members.index.page(q, cursor, page_size('SOCIAL_MEMBER_PAGE_SIZE', 50))
+    next_cursor = encode_cursor(*last) if last else None
+    return render(request, 'users_list.html', {
+        'users': members.load([pk for pk, _ in rows]),
+        'q': q,
+        'first_query': urlencode({'q': q}) if q else '',
+        'next_query': urlencode({'q': q, 'cursor': next_cursor}) if next_cursor else '',
+        'is_first_page': cursor is None,
+        'followed_ids': follows.followed_ids(request.user),
+    })
+
+
+@login_required
+def members_typeahead(request):
+    q = (request.GET.get('q') or '').strip()
+    names = members.typeahead(q) if q else []
+    return JsonResponse({'results': [
+        {'username': name, 'url': reverse('social:profile', args=[name])} for name in names
+    ]})
+
+EXPLORE_SORTS = {
+    # sort -> (keyset ordering, cursor types)
+    'top': (('-score', '-id'), (float, int)),
+    'latest': (('-created_at', '-id'), (datetime, int)),
+}
 
 @login_required
 def posts_explore(request):
-    qs = (Post.objects
-          .select_related('author', 'author__profile')
-          .order_by('-created_at'))
-
-    paginator = Paginator(qs, 25)
-    page_obj = paginator.get_page(request.GET.get('page'))
-    posts = list(page_obj.object_list)
-
-    # Render markdown (safe fallback)
-    for p in posts:
-        try:
-            p.rendered_html = render_markdown(p.body)
-        except Exception:
-            p.rendered_html = None
-
-    # ----- attach replies without relying on related_name -----
-    post_ids = [p.id for p in posts]
-    reply_map = defaultdict(list)
-    for r in (Reply.objects
-              .filter(post_id__in=post_ids)
-              .select_related('author', 'author__profile')
-              .order_by('created_at')):
-        reply_map[r.post_id].append(r)
-
-    for p in posts:
-        p.reply_list = reply_map.get(p.id, [])
-        p.reply_count = len(p.reply_list)
-    # ----------------------------------------------------------
+    sort = request.GET.get('sort')
+    if sort not in EXPLORE_SORTS:
+        sort = 'top'
+    fields, types = EXPLORE_SORTS[sort]
+    cursor = decode_cursor(request.GET.get('cursor'), *types)
+    posts, next_cursor = keyset_page(
+        Post.objects.select_related('author', 'author__profile'),
+        fields, cursor, page_size('SOCIAL_EXPLORE_PAGE_SIZE', 25),
+    )
+
+    # latest few replies per post; the full thread is on post-replies
+    replies.attach_latest(posts)
+    reactions.annotate_posts(request.user, posts)
+    post_counters.overlay(posts)
+    fragments.prime(posts)
 
     return render(request, 'explore.html', {
-        'page_obj': page_obj,
         'posts': posts,
+        'sort': sort,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+        'followed_ids': follows.followed_ids(request.user),
         'reply_form': ReplyForm(),  # not used to submit, but fine to render
     })
 
+# -----------------------
+# Search
+# -----------------------
+@login_required
+def search_view(request):
+    q = (request.GET.get('q') or '').strip()
+    kind = request.GET.get('type') or ''
+    lang = request.GET.get('lang') or ''
+    # unknown filters are ignored rather than erroring
+    if kind not in dict(search.TYPE_CHOICES):
+        kind = ''
+    if lang not in dict(LANGUAGE_CHOICES):
+        lang = ''
+
+    cursor = decode_cursor(request.GET.get('cursor'), float, int)
+    hits, next_cursor = [], None
+    size = page_size('SOCIAL_SEARCH_PAGE_SIZE', 20)
+    if q and kind == 'code':
+        # identifier/substring search over snippet code (trigram index)
+        hits, next_cursor = search.backend().code_search(q, language=lang or None, cursor=cursor, size=size)
+    elif q:
+        hits, next_cursor = search.backend().search(
+            q, kinds=[kind] if kind else None, language=lang or None, cursor=cursor, size=size,
+        )
+
+    params = {'q': q, 'type': kind, 'lang': lang}
+    return render(request, 'search.html', {
+        'q': q,
+        'kind': kind,
+        'lang': lang,
+        'hits': hits,
+        'kinds': search.TYPE_CHOICES,
+        'languages': LANGUAGE_CHOICES,
+        'first_query': urlencode(params),
+        'next_query': urlencode({**params, 'cursor': next_cursor}) if next_cursor else '',
+        'is_first_page': cursor is None,
+    })
+
+# -----------------------
+# Live updates
+# -----------------------
+@login_required
+def live_stream(request):
+    # The stream is served by the ASGI app (async_views.live_stream); under
+    # WSGI every open page would hold a worker thread. 204 tells EventSource
+    # not to reconnect, and pages simply update on reload.
+    return HttpResponse(status=204)
+
+# -----------------------
+# Metrics
+# -----------------------
+@staff_member_required
+def cache_metrics(request):
+    # hit/miss counts per cache namespace, for this process
+    return JsonResponse(caching.stats())
+
 # -----------------------
 # Public feed fallback (kept if you still route it)
 # -----------------------